@@ -0,0 +1,247 @@
+'''
+Benchmark suite of the backends over synthetic workloads: wide arrays of
+small records, deeply nested maps, string-heavy and number-heavy documents
+and one huge string. Documents are generated from a fixed seed, so runs
+compare the same input.
+
+``basic_parse``, ``parse`` and ``items`` of every available backend are
+timed, best of `--repeat` runs, and reported as events/s and MB/s. The peak
+of memory allocated while parsing is measured by tracemalloc in a separate
+run, since tracing slows parsing down; it counts Python allocations only,
+not the buffers of the yajl library.
+
+Results can be written as JSON with `--output`, and checked against the
+results of a previous run with `--compare`: timings slower by more than
+`--tolerance` are listed and make the exit status 1.
+
+Usage: PYTHONPATH=. python benchmarks/backends.py [--size MB] [--output results.json]
+           [--compare previous.json] [--backends python,yajl2] [--workloads wide,deep]
+'''
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from io import BytesIO
+
+import enumjson
+
+
+SEED = 1234
+WORDS = ['alpha', 'beta', 'gamma', 'delta', u'été', u'日本', 'quote"',
+         'back\\slash', 'tab\t', 'line\nfeed']
+
+
+def wide(size, rng):
+    '''
+    An array of small flat records.
+    '''
+    records = []
+    length = 0
+    while length < size:
+        record = {
+            'id': len(records),
+            'name': rng.choice(WORDS),
+            'score': round(rng.random() * 100, 3),
+            'active': rng.random() < 0.5,
+            'parent': None,
+            'tags': [rng.choice(WORDS) for _ in range(3)],
+        }
+        records.append(record)
+        length += 120
+    return records, 'item'
+
+
+def deep(size, rng):
+    '''
+    An array of maps nested 64 levels deep with a few members at each level.
+    '''
+    documents = []
+    length = 0
+    while length < size:
+        document = {'leaf': rng.randint(0, 1000)}
+        for level in range(64):
+            document = {'level': level, 'name': rng.choice(WORDS), 'child': document}
+        documents.append(document)
+        length += 64 * 45
+    return documents, 'item'
+
+
+def strings(size, rng):
+    '''
+    An array of records holding long strings with escapes and non-ASCII
+    characters.
+    '''
+    records = []
+    length = 0
+    while length < size:
+        text = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(20, 200)))
+        records.append({'key': rng.choice(WORDS), 'text': text})
+        length += len(text) + 30
+    return records, 'item'
+
+
+def numbers(size, rng):
+    '''
+    An array of arrays of integers, decimals and exponents.
+    '''
+    rows = []
+    length = 0
+    while length < size:
+        rows.append([rng.randint(-10 ** 9, 10 ** 9), rng.random(), rng.random() * 1e300,
+                     rng.randint(0, 9), -rng.random() * 1e-300])
+        length += 90
+    return rows, 'item.item'
+
+
+def huge_string(size, rng):
+    '''
+    A map with one string holding nearly the whole document.
+    '''
+    letters = 'abcdefghijklmnopqrstuvwxyz0123456789+/ '
+    return {'blob': ''.join(rng.choice(letters) for _ in range(size)), 'size': size}, 'blob'
+
+
+WORKLOADS = [
+    ('wide', wide),
+    ('deep', deep),
+    ('strings', strings),
+    ('numbers', numbers),
+    ('huge_string', huge_string),
+]
+FUNCTIONS = ('basic_parse', 'parse', 'items')
+
+
+def generate(workload, size):
+    '''
+    Returns the JSON text of a workload of about `size` bytes and the
+    prefix its items are taken at.
+    '''
+    value, prefix = workload(size, random.Random(SEED))
+    return json.dumps(value, ensure_ascii=False).encode('utf-8'), prefix
+
+
+def available_backends(names=None):
+    backends = []
+    for name in names or enumjson.BACKENDS:
+        try:
+            backends.append((name, enumjson.get_backend(name)))
+        except (ImportError, OSError):
+            pass
+    return backends
+
+
+def consume(backend, function, data, prefix):
+    if function == 'items':
+        iterator = backend.items(BytesIO(data), prefix)
+    else:
+        iterator = getattr(backend, function)(BytesIO(data))
+    count = 0
+    for _ in iterator:
+        count += 1
+    return count
+
+
+def measure(backend, function, data, prefix, repeat):
+    '''
+    Returns the best time of `repeat` runs and the peak of traced memory.
+    '''
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        consume(backend, function, data, prefix)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    tracemalloc.start()
+    consume(backend, function, data, prefix)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak
+
+
+def run(size, backends, workloads, repeat):
+    results = []
+    for workload_name, workload in workloads:
+        data, prefix = generate(workload, size)
+        for backend_name, backend in backends:
+            events = consume(backend, 'basic_parse', data, prefix)
+            for function in FUNCTIONS:
+                seconds, peak = measure(backend, function, data, prefix, repeat)
+                result = {
+                    'backend': backend_name,
+                    'workload': workload_name,
+                    'function': function,
+                    'bytes': len(data),
+                    'events': events,
+                    'seconds': seconds,
+                    'events_per_s': events / seconds,
+                    'mb_per_s': len(data) / seconds / 1024 / 1024,
+                    'peak_bytes': peak,
+                }
+                results.append(result)
+                print('%-12s %-12s %-12s %10.0f events/s %8.2f MB/s peak %8.1f MB' % (
+                    backend_name, workload_name, function, result['events_per_s'],
+                    result['mb_per_s'], peak / 1024.0 / 1024))
+    return results
+
+
+def compare(results, previous, tolerance):
+    '''
+    Returns descriptions of the results slower than in `previous` by more
+    than `tolerance`, a fraction of the previous time.
+    '''
+    before = dict(((r['backend'], r['workload'], r['function']), r) for r in previous)
+    regressions = []
+    for result in results:
+        old = before.get((result['backend'], result['workload'], result['function']))
+        if old is None or old['bytes'] != result['bytes']:
+            continue
+        if result['seconds'] > old['seconds'] * (1 + tolerance):
+            regressions.append('%s %s %s: %.2f MB/s, was %.2f MB/s' % (
+                result['backend'], result['workload'], result['function'],
+                result['mb_per_s'], old['mb_per_s']))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmarks the enumjson backends.')
+    parser.add_argument('--size', type=float, default=4, help='size of each workload in MB')
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs, the best is kept')
+    parser.add_argument('--backends', help='comma separated backend names')
+    parser.add_argument('--workloads', help='comma separated workload names')
+    parser.add_argument('--output', help='file to write the results to as JSON')
+    parser.add_argument('--compare', help='results of a previous run to compare with')
+    parser.add_argument('--tolerance', type=float, default=0.1,
+                        help='slowdown allowed by --compare, as a fraction')
+    args = parser.parse_args(argv)
+
+    backends = available_backends(args.backends and args.backends.split(','))
+    workloads = WORKLOADS
+    if args.workloads:
+        names = args.workloads.split(',')
+        workloads = [workload for workload in WORKLOADS if workload[0] in names]
+    results = run(int(args.size * 1024 * 1024), backends, workloads, args.repeat)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'enumjson': enumjson.__version__,
+                'python': platform.python_version(),
+                'size': args.size,
+                'seed': SEED,
+                'results': results,
+            }, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)['results']
+        regressions = compare(results, previous, args.tolerance)
+        for regression in regressions:
+            print('regression: %s' % regression)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,37 @@
+'''
+Regression benchmark for long string lexemes in the pure-Python lexer: a
+document with one huge base64-like string is lexed with the default buffer
+size, and the time and the peak of memory allocated while lexing (tracked
+by tracemalloc, the input itself excluded) are reported.
+
+Usage: PYTHONPATH=. python benchmarks/long_strings.py [megabytes ...]
+'''
+import sys
+import time
+import tracemalloc
+from io import BytesIO
+
+from enumjson.backends import python
+
+
+def document(size):
+    blob = b'QUJDREVGR0hJSktMTU5PUFFSU1RVVldYWVo0MTIzNDU2Nzg5\\/+='
+    blob = blob * (size // len(blob) + 1)
+    return b'{"blob": "' + blob[:size] + b'", "number": 12345}'
+
+
+def run(megabytes):
+    source = BytesIO(document(megabytes * 1024 * 1024))
+    tracemalloc.start()
+    started = time.time()
+    for _ in python.Lexer(source):
+        pass
+    elapsed = time.time() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print('%4d MB string: %8.3f s, peak %8.1f MB' % (megabytes, elapsed, peak / 1024.0 / 1024))
+
+
+if __name__ == '__main__':
+    for megabytes in [int(arg) for arg in sys.argv[1:]] or [1, 4, 16, 64]:
+        run(megabytes)
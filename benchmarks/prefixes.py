@@ -0,0 +1,62 @@
+'''
+Measures the cost of prefix construction in enumjson.common.parse on deep
+and on wide documents. Basic events are generated in memory so that only
+common.parse is timed.
+
+Usage: PYTHONPATH=. python benchmarks/prefixes.py
+'''
+import time
+
+from enumjson import common
+
+
+def deep_events(depth, leaves):
+    '''
+    A chain of `depth` nested maps with `leaves` scalar members at the bottom.
+    '''
+    events = []
+    for level in range(depth):
+        events.append(('start_map', None))
+        events.append(('map_key', 'level%d' % level))
+    events.append(('start_map', None))
+    for leaf in range(leaves):
+        events.append(('map_key', 'leaf%d' % leaf))
+        events.append(('number', str(leaf)))
+    events.append(('end_map', None))
+    for level in range(depth):
+        events.append(('end_map', None))
+    return events
+
+
+def wide_events(records, fields):
+    '''
+    An array of `records` flat maps with `fields` scalar members each.
+    '''
+    events = [('start_array', None)]
+    for record in range(records):
+        events.append(('start_map', None))
+        for field in range(fields):
+            events.append(('map_key', 'field%d' % field))
+            events.append(('string', 'value'))
+        events.append(('end_map', None))
+    events.append(('end_array', None))
+    return events
+
+
+def run(name, events, **kwargs):
+    started = time.time()
+    for _ in common.parse(events, **kwargs):
+        pass
+    elapsed = time.time() - started
+    print('%-24s %8d events %8.3f s %10.0f events/s' % (
+        name, len(events), elapsed, len(events) / elapsed))
+
+
+if __name__ == '__main__':
+    deep = deep_events(50, 200000)
+    wide = wide_events(20000, 20)
+    run('deep', deep)
+    run('wide', wide)
+    for prefix_type in ('tuple', 'depth'):
+        run('deep (%s)' % prefix_type, deep, prefix_type=prefix_type)
+        run('wide (%s)' % prefix_type, wide, prefix_type=prefix_type)
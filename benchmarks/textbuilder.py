@@ -0,0 +1,41 @@
+'''
+Measures how TextBuilder scales with the size of a single record.
+
+Usage: PYTHONPATH=. python benchmarks/textbuilder.py
+'''
+import time
+
+from enumjson.common import TextBuilder
+
+
+def record_events(size):
+    '''
+    Events of one map with string members, about `size` bytes of JSON text.
+    '''
+    events = [('start_map', None)]
+    member = 'x' * 80 + '"\\'
+    count = 0
+    while count * (len(member) + 16) < size:
+        events.append(('map_key', 'key%d' % count))
+        events.append(('string', member))
+        count += 1
+    events.append(('end_map', None))
+    return events
+
+
+def run(size):
+    events = record_events(size)
+    started = time.time()
+    builder = TextBuilder()
+    for event, value in events:
+        builder.event(event, value)
+    text = builder.value
+    elapsed = time.time() - started
+    return len(text), elapsed
+
+
+if __name__ == '__main__':
+    for megabytes in (1, 2, 4, 8, 16):
+        length, elapsed = run(megabytes * 1024 * 1024)
+        print('%3d MB record: %9d chars %8.3f s %8.1f MB/s' % (
+            megabytes, length, elapsed, length / elapsed / 1024 / 1024))
@@ -6,20 +6,212 @@ Main API:
 - ``enumjson.parse``: iterator returning parsing events with the object tree context,
   see ``enumjson.common.parse`` for docs.
 
-- ``enumjson.items``: iterator returning Python objects found under a specified prefix,
-  see ``enumjson.common.items`` for docs.
+- ``enumjson.items``: iterator returning JSON text or, with ``as_objects=True``,
+  Python objects found under a specified prefix, see ``enumjson.common.items``
+  for docs.
 
-Top-level ``enumjson`` module exposes method from the pure Python backend. There's
-also two other backends using the C library yajl in ``enumjson.backends`` that have
-the same API and are faster under CPython.
+- ``enumjson.multi_items``: iterator returning items matching any of several
+  prefix patterns (with ``*`` and ``**`` wildcards) in one pass, see
+  ``enumjson.common.multi_items`` for docs.
+
+- ``enumjson.iter_documents``, ``enumjson.items_per_document``: documents and items
+  of a stream of concatenated JSON values, such as JSON Lines, along with the index
+  and the byte offset of their document, see ``enumjson.common.iter_documents``.
+
+- ``enumjson.basic_parse_path``, ``enumjson.parse_path``, ``enumjson.items_path``:
+  the same over a memory mapped file given by its path.
+
+- ``enumjson.parallel``: items of large arrays or of the lines of JSON Lines files
+  parsed by a pool of processes, to be imported explicitly.
+
+- ``enumjson.index``: sidecar files of the offsets of array items, for reading
+  single items without parsing the whole file, to be imported explicitly.
+
+- ``enumjson.asyncio``: asynchronous versions of ``basic_parse``, ``parse`` and
+  ``items`` over streams with an awaitable ``read``, to be imported explicitly.
+
+Top-level ``enumjson`` module exposes methods from the fastest backend available.
+The backends in ``enumjson.backends`` are tried in the order of ``BACKENDS``: the
+wrappers of the C library yajl first, then the pure Python one. A backend is only
+chosen once it has parsed a sample document like the python backend does. The chosen
+backend is named by ``enumjson.backend_name``. The choice can be forced with the
+``ENUMJSON_BACKEND`` environment variable, and any backend can be loaded with
+``enumjson.get_backend``.
+
+The top-level functions take the parameters of the python backend whatever the
+chosen backend, options of the yajl backends such as ``trusted`` being passed as
+keyword arguments. Text streams and ``raw=True`` items, which only the python
+backend supports, are parsed by it, and so is everything when yajl isn't available.
+The python backend ignores the options of the yajl backends, always validating the
+input fully.
 '''
-from enumjson.common import JSONError, IncompleteJSONError, TextBuilder
-import enumjson.backends.python as backend
+import os
+from importlib import import_module
+from io import BytesIO
+
+from enumjson.common import JSONError, IncompleteJSONError, TextBuilder, ObjectBuilder, \
+    PrefixMatcher, MappedFile, Skipper, DocumentOffsets, EVENT_NAMES, EVENT_CODES
+from enumjson.backends import python as _python
 
 
 __version__ = '0.1.1'
 
+BACKENDS = ('yajl2_cffi', 'yajl2', 'yajl', 'python')
+
+
+def get_backend(name):
+    '''
+    Imports and returns a backend module by name, for example ``'yajl2'``.
+    Raises ImportError (YAJLImportError for the yajl wrappers) when the
+    backend can't be loaded.
+    '''
+    return import_module('enumjson.backends.%s' % name)
+
+
+# A sample document a backend must parse like the python backend to be chosen
+_SAMPLE = b'{"a": [1, -2.5e3, "\\u00e9t\xc3\xa9", true, null, {}]}'
+
+
+def _works(module):
+    '''
+    Tells whether a backend parses the sample document correctly.
+    '''
+    try:
+        events = list(module.basic_parse(BytesIO(_SAMPLE)))
+    except Exception:
+        return False
+    return events == list(_python.basic_parse(BytesIO(_SAMPLE)))
+
+
+def _find_backend():
+    name = os.environ.get('ENUMJSON_BACKEND')
+    if name:
+        return name, get_backend(name)
+    for name in BACKENDS:
+        try:
+            module = get_backend(name)
+        except (ImportError, OSError):
+            continue
+        if _works(module):
+            return name, module
+    raise ImportError('No enumjson backend could be loaded')
+
+
+backend_name, backend = _find_backend()
+
+
+# Options of the yajl backends that the python backend doesn't take
+_YAJL_OPTIONS = ('allow_comments', 'dont_validate_strings', 'allow_trailing_garbage',
+                 'allow_partial_values', 'trusted')
+
+
+def _backend_for(file, config, raw=False):
+    '''
+    Returns the backend to parse `file` with: the chosen one, unless `file`
+    reads text or raw items are asked for, which only the python backend
+    supports. The options of the yajl backends are dropped from `config`
+    when the python backend is returned.
+    '''
+    if backend is not _python and not raw and isinstance(file.read(0), (bytes, memoryview)):
+        return backend
+    for option in _YAJL_OPTIONS:
+        config.pop(option, None)
+    return _python
+
+
+def _options(buf_size, config):
+    # the backends have their own default buffer sizes
+    if buf_size is not None:
+        config['buf_size'] = buf_size
+    return config
+
+
+def basic_parse(file, buf_size=None, skipper=None, codes=False, number=None,
+                multiple_values=False, offsets=None, **config):
+    '''
+    ``basic_parse`` of the chosen backend, see
+    ``enumjson.backends.python.basic_parse`` for the parameters.
+    '''
+    return _backend_for(file, config).basic_parse(file, skipper=skipper, codes=codes,
+                                                  number=number, multiple_values=multiple_values,
+                                                  offsets=offsets, **_options(buf_size, config))
+
+
+def parse(file, buf_size=None, skipper=None, codes=False, number=None, **config):
+    '''
+    ``parse`` of the chosen backend, see ``enumjson.common.parse``.
+    '''
+    return _backend_for(file, config).parse(file, skipper=skipper, codes=codes, number=number,
+                                            **_options(buf_size, config))
+
+
+def items(file, prefix, raw=False, as_objects=False, number=None, skip=False, buf_size=None,
+          **config):
+    '''
+    ``items`` of the chosen backend, see ``enumjson.common.items`` and
+    ``enumjson.backends.python.items``.
+    '''
+    if raw:
+        config['raw'] = raw
+    return _backend_for(file, config, raw).items(file, prefix, as_objects=as_objects,
+                                                 number=number, skip=skip,
+                                                 **_options(buf_size, config))
+
+
+def multi_items(file, patterns, as_objects=False, number=None, skip=False, **config):
+    '''
+    ``multi_items`` of the chosen backend, see ``enumjson.common.multi_items``.
+    '''
+    return _backend_for(file, config).multi_items(file, patterns, as_objects=as_objects,
+                                                  number=number, skip=skip, **config)
+
+
+def iter_documents(file, as_objects=False, number=None, buf_size=None, **config):
+    '''
+    ``iter_documents`` of the chosen backend, see
+    ``enumjson.common.iter_documents``.
+    '''
+    return _backend_for(file, config).iter_documents(file, as_objects=as_objects, number=number,
+                                                     **_options(buf_size, config))
+
+
+def items_per_document(file, prefix, as_objects=False, number=None, buf_size=None, **config):
+    '''
+    ``items_per_document`` of the chosen backend, see
+    ``enumjson.common.items_per_document``.
+    '''
+    return _backend_for(file, config).items_per_document(file, prefix, as_objects=as_objects,
+                                                         number=number,
+                                                         **_options(buf_size, config))
+
+
+def _mapped(path, function, *args, **kwargs):
+    with MappedFile(path) as f:
+        events = function(f, *args, **kwargs)
+        try:
+            for event in events:
+                yield event
+        finally:
+            # release the backend's views of the mapping before it is closed
+            events.close()
+
+
+def basic_parse_path(path, **kwargs):
+    '''
+    ``basic_parse`` over a memory mapped file.
+    '''
+    return _mapped(path, basic_parse, **kwargs)
+
+
+def parse_path(path, **kwargs):
+    '''
+    ``parse`` over a memory mapped file.
+    '''
+    return _mapped(path, parse, **kwargs)
+
 
-basic_parse = backend.basic_parse
-parse = backend.parse
-items = backend.items
+def items_path(path, prefix, **kwargs):
+    '''
+    ``items`` over a memory mapped file.
+    '''
+    return _mapped(path, items, prefix, **kwargs)
@@ -0,0 +1,96 @@
+'''
+Parsing of asynchronous streams (Python 3.6+).
+
+The functions here mirror ``basic_parse``, ``parse`` and ``items`` of the
+backends as asynchronous generators over any object with an awaitable
+``read(size)`` method returning bytes or text, such as
+``asyncio.StreamReader`` or the content stream of an aiohttp response::
+
+    async for doc in enumjson.asyncio.items(response.content, 'docs.item'):
+        ...
+
+Each chunk read is parsed right away and nothing blocks in between. The
+yajl2_cffi backend is used when it is the selected backend or is asked for
+with `backend`, otherwise the pure-python one is, both through the push
+interface of their Parser, which encodes text to UTF-8. Containers can't be
+skipped in this mode.
+'''
+import enumjson
+from enumjson import common
+from enumjson.backends import python
+
+
+BUFSIZE = 64 * 1024
+
+
+async def basic_parse_batches(f, buf_size=BUFSIZE, backend=None, codes=False, number=None,
+                              **config):
+    '''
+    Asynchronous iterator yielding the list of unprefixed events produced
+    from each chunk of input.
+
+    Parameters:
+
+    - f: an object with a ``read(size)`` coroutine returning JSON input
+    - buf_size: a size of the chunks read
+    - backend: 'yajl2_cffi' or 'python', defaults to the one matching the
+      selected backend
+    - codes: whether to produce event codes instead of names, see
+      basic_parse of the backends
+    - number: a callable converting number lexemes, see basic_parse of the
+      backends
+    - config: options of the Parser of the backend, such as allow_comments
+      for yajl2_cffi or multiple_values; options the backend doesn't know
+      raise TypeError
+    '''
+    if backend is None:
+        backend = 'yajl2_cffi' if enumjson.backend_name == 'yajl2_cffi' else 'python'
+    if backend == 'yajl2_cffi':
+        parser = enumjson.get_backend('yajl2_cffi').Parser(codes=codes, number=number, **config)
+    elif backend == 'python':
+        parser = python.Parser(codes=codes, number=number, **config)
+    else:
+        raise ValueError('Backend %r has no push interface' % (backend,))
+    while True:
+        data = await f.read(buf_size)
+        if data:
+            parser.feed(data)
+        else:
+            parser.close()
+        events = parser.events()
+        if events:
+            yield events
+        if not data:
+            break
+
+
+async def basic_parse(f, buf_size=BUFSIZE, backend=None, codes=False, **config):
+    '''
+    Asynchronous iterator yielding unprefixed events. Takes the same
+    parameters as basic_parse_batches.
+    '''
+    async for events in basic_parse_batches(f, buf_size, backend, codes, **config):
+        for event in events:
+            yield event
+
+
+async def parse(f, buf_size=BUFSIZE, backend=None, codes=False, **config):
+    '''
+    Asynchronous version of enumjson.common.parse.
+    '''
+    prefix_batch = common.batch_prefixer(codes)
+    async for events in basic_parse_batches(f, buf_size, backend, codes, **config):
+        for event in prefix_batch(events):
+            yield event
+
+
+async def items(f, prefix, as_objects=False, number=None, buf_size=BUFSIZE,
+                backend=None, codes=False, **config):
+    '''
+    Asynchronous version of enumjson.common.items.
+    '''
+    prefix_batch = common.batch_prefixer(codes)
+    collect = common.item_collector(prefix, as_objects=as_objects, number=number)
+    async for events in basic_parse_batches(f, buf_size, backend, codes, **config):
+        for item in collect(prefix_batch(events)):
+            yield item
@@ -1,7 +1,260 @@
+import re
+
+from enumjson import common
+from enumjson.compat import bytetype
+
+
 class YAJLImportError(ImportError):
     pass
 
 
+DEPTH_CHANGE = common.DEPTH_CHANGE
+
+def skip_events(events, index):
+    '''
+    Skips the buffered events of a container whose start event precedes
+    ``events[index]``. Returns the index following its end event and 0, or
+    the length of `events` and the depth still open when the container
+    continues past the buffered events.
+    '''
+    depth = 1
+    while index < len(events):
+        depth += DEPTH_CHANGE.get(events[index][0], 0)
+        index += 1
+        if not depth:
+            return index, 0
+    return index, depth
+
+
+class Events(list):
+    '''
+    Events collected by the callbacks of a yajl parser. While `skipping` is
+    not zero the callbacks only track the depth of a skipped container.
+    Number lexemes are converted with `number` unless it is None.
+    '''
+    __slots__ = ('skipping', 'number')
+
+    def __init__(self, number=None):
+        super(Events, self).__init__()
+        self.skipping = 0
+        self.number = number
+
+
+# whitespace as skipped by the lexer of yajl
+NONBLANK_RE = re.compile(b'[^ \\t\\n\\v\\f\\r]')
+
+
+class DocumentSplitter(object):
+    '''
+    Runs yajl over a stream of concatenated documents one document at a
+    time, which yajl 1 can't do otherwise and which lets the offsets of the
+    documents be known. yajl stops as soon as the value it is given is
+    complete, a handle allowing trailing garbage in the case of yajl 2, and
+    the rest of the input goes to a new handle. The byte offset where every
+    document starts is appended to `offsets`.
+
+    yajl 2 can't reset a parser handle (2.1 only has yajl_gen_reset, for
+    generators), so every document costs a handle allocation. Making a
+    finished handle take another value by turning multiple_values on and
+    off around an empty parse measured no faster, three calls through the
+    FFI taking as long as the allocation.
+    '''
+    __slots__ = ('offsets', 'position', 'started')
+
+    def __init__(self, offsets):
+        self.offsets = offsets
+        self.position = 0
+        self.started = False
+
+    def parse(self, buffer, parse, renew):
+        '''
+        Parses a chunk of input with ``parse(buffer, start)``, which parses
+        `buffer` from `start` on and returns the number of bytes the handle
+        consumed, and ``renew()``, which retires the handle of the document
+        that ended, the next one getting a fresh handle. The end of input
+        is an empty chunk, which only completes a document in progress.
+        '''
+        length = len(buffer)
+        if not length:
+            if self.started:
+                parse(buffer, 0)
+            return
+        start = 0
+        while True:
+            if not self.started:
+                match = NONBLANK_RE.search(buffer, start)
+                if match is None:
+                    break
+                start = match.start()
+                self.offsets.append(self.position + start)
+                self.started = True
+            start += parse(buffer, start)
+            if start >= length:
+                break
+            # the document is complete before the end of the chunk
+            renew()
+            self.started = False
+        self.position += length
+
+
+class YajlParser(object):
+    '''
+    Reusable parser of the yajl 2 backends. The callbacks are built once per
+    backend, and the event list and its context outlive a document: only the
+    yajl handle is renewed, so that parsing many small documents with one
+    parser costs little more than the parsing itself. A handle is allocated
+    when a document starts being parsed and freed once it ends, so that each
+    document costs one allocation.
+
+    Documents are pulled from files with ``basic_parse`` and
+    ``basic_parse_batches``, or pushed with ``feed`` and ``close`` like with
+    python.Parser, the events produced so far being taken with ``events``.
+    Like python.Parser, ``feed`` takes bytes or text, which is encoded to
+    UTF-8.
+    ``close`` leaves the parser ready for the next document, and ``reset``
+    discards the current one, as is needed after an error.
+
+    Given an enumjson.common.DocumentOffsets, ``basic_parse`` reads
+    concatenated documents, such as JSON Lines, see DocumentSplitter.
+
+    Subclasses implement ``_context``, ``_alloc``, ``_parse`` and ``_free``
+    over the library, ``_alloc`` setting the yajl_option flags of
+    ``options``, and ``_parse(buffer, start)`` parsing `buffer` from `start`
+    on and returning the number of bytes consumed.
+    '''
+    def __init__(self, codes=False, number=None, **config):
+        self.codes = codes
+        self.config = config
+        self.options = yajl2_options(**config)
+        self.buffered = Events(number)
+        self.context = self._context(self.buffered)
+        self.handle = None
+
+    def __del__(self):
+        if getattr(self, 'handle', None) is not None:
+            self._free(self.handle)
+
+    def _release(self):
+        handle, self.handle = self.handle, None
+        if handle is not None:
+            self._free(handle)
+
+    def _parse_chunk(self, buffer, start=0):
+        if self.handle is None:
+            self.handle = self._alloc()
+        return self._parse(buffer, start)
+
+    def reset(self):
+        del self.buffered[:]
+        self.buffered.skipping = 0
+        self._release()
+
+    def feed(self, data):
+        if not isinstance(data, (bytetype, memoryview)):
+            data = data.encode('utf-8')
+        if data:
+            self._parse_chunk(data)
+
+    def close(self):
+        self._parse_chunk(b'')
+        self._release()
+
+    def events(self):
+        events = list(self.buffered)
+        del self.buffered[:]
+        return events
+
+    def _chunks(self, f, buf_size, offsets=None):
+        '''
+        Iterator yielding the event list, cleared afterwards, once each
+        chunk of input is parsed.
+        '''
+        self.reset()
+        if offsets is None:
+            parse = self._parse_chunk
+        else:
+            options = self.options
+            self.options = yajl2_options(**dict(self.config, allow_trailing_garbage=True,
+                                                multiple_values=False))
+            splitter = DocumentSplitter(offsets)
+            parse = lambda buffer: splitter.parse(buffer, self._parse_chunk, self._release)
+        try:
+            while True:
+                buffer = f.read(buf_size)
+                parse(buffer)
+                if self.buffered:
+                    yield self.buffered
+                    del self.buffered[:]
+                if not buffer:
+                    break
+        finally:
+            if offsets is not None:
+                self.options = options
+            self._release()
+
+    def basic_parse(self, f, buf_size=64 * 1024, skipper=None, offsets=None):
+        '''
+        Iterator yielding unprefixed events of the document in `f`, see
+        basic_parse of the backend.
+        '''
+        buffered = self.buffered
+        for events in self._chunks(f, buf_size, offsets):
+            index = 0
+            while index < len(events):
+                event = events[index]
+                index += 1
+                yield event
+                if skipper is not None and skipper.skip:
+                    skipper.skip = False
+                    index, buffered.skipping = skip_events(events, index)
+                    if not buffered.skipping:
+                        yield events[index - 1]
+
+    def basic_parse_batches(self, f, buf_size=64 * 1024):
+        '''
+        Iterator yielding lists of unprefixed events of the document in `f`,
+        one list per chunk of input.
+        '''
+        for events in self._chunks(f, buf_size):
+            yield list(events)
+
+
+# yajl_option values of yajl 2, defined in yajl_parse.h
+YAJL_ALLOW_COMMENTS = 0x01
+YAJL_DONT_VALIDATE_STRINGS = 0x02
+YAJL_ALLOW_TRAILING_GARBAGE = 0x04
+YAJL_ALLOW_MULTIPLE_VALUES = 0x08
+YAJL_ALLOW_PARTIAL_VALUES = 0x10
+
+def yajl2_options(allow_comments=False, multiple_values=False, dont_validate_strings=False,
+                  allow_trailing_garbage=False, allow_partial_values=False, trusted=False):
+    '''
+    Returns the yajl_option flags to set on a yajl 2 handle for the parser
+    options given as keyword arguments.
+
+    ``trusted=True`` is the fast mode for input already known to be valid,
+    such as dumps validated when they were produced: it turns on
+    dont_validate_strings, so that strings aren't checked to be UTF-8, and
+    allow_partial_values, so that a truncated document ends the events
+    instead of raising an error and the items completed before the cut are
+    salvaged.
+
+    With dont_validate_strings, invalid UTF-8 in strings and map keys is
+    replaced with U+FFFD rather than raising, since errors can't be raised
+    from the yajl callbacks.
+    '''
+    if trusted:
+        dont_validate_strings = allow_partial_values = True
+    options = [
+        (YAJL_ALLOW_COMMENTS, allow_comments),
+        (YAJL_DONT_VALIDATE_STRINGS, dont_validate_strings),
+        (YAJL_ALLOW_TRAILING_GARBAGE, allow_trailing_garbage),
+        (YAJL_ALLOW_MULTIPLE_VALUES, multiple_values),
+        (YAJL_ALLOW_PARTIAL_VALUES, allow_partial_values),
+    ]
+    return [option for option, enabled in options if enabled]
+
+
 def require_version(version, required):
     '''
     Asserts that the major component of 'version' is equal to 'required'.
@@ -12,6 +265,34 @@ def require_version(version, required):
     if major != required:
         raise YAJLImportError('YAJL version %s.x required, found %s.%s.%s' % (required, major, minor, micro))
 
+def c_buffer(buffer):
+    '''
+    Returns an input buffer in a form accepted by ctypes as a char pointer.
+    Bytes are passed as they are and writable buffers, such as the views of
+    a MappedFile, are referenced without copying.
+    '''
+    if isinstance(buffer, bytes):
+        return buffer
+    from ctypes import c_char
+    try:
+        return (c_char * len(buffer)).from_buffer(buffer)
+    except TypeError:
+        return bytes(buffer)
+
+def c_pointer(data, start):
+    '''
+    Returns a pointer to `start` bytes into `data`, an input buffer as
+    returned by c_buffer, which must be kept alive as long as the pointer
+    is used.
+    '''
+    from ctypes import c_void_p, addressof, cast
+    if isinstance(data, bytes):
+        address = cast(data, c_void_p).value
+    else:
+        # casting the array itself would tie it to a reference cycle
+        address = addressof(data)
+    return c_void_p(address + start)
+
 def find_yajl_ctypes(required):
     '''
     Finds and loads yajl shared object of the required major
@@ -2,9 +2,8 @@
 Pure-python parsing backend.
 '''
 from __future__ import unicode_literals
-import decimal
 import re
-from codecs import getreader
+from collections import deque
 from json.decoder import scanstring
 
 from enumjson import common
@@ -12,168 +11,605 @@ from enumjson.compat import bytetype
 
 
 BUFSIZE = 16 * 1024
-LEXEME_RE = re.compile(r'[a-z0-9eE\.\+-]+|\S')
+# Lexemes of UTF-8 input: complete strings, words, non-ASCII characters and
+# single characters. A string with no closing quote is matched up to the end
+# of the buffer, where it is cut.
+LEXEME_RE = re.compile(br'"[^"\\]*(?:\\.[^"\\]*)*"|".*|[a-z0-9eE\.\+-]+|[\xc0-\xff][\x80-\xbf]*|\S',
+                       re.S)
+WORD_RE = re.compile(br'[a-z0-9eE\.\+-]*')
+STRUCTURE_RE = re.compile(br'["\[\]{}]')
+NUMBER_RE = re.compile(br'-?(?:0|[1-9][0-9]*)(?:\.[0-9]+)?(?:[eE][-+]?[0-9]+)?\Z')
+# first bytes of lexemes, compared with lexeme[0] which is an int on Python 3
+QUOTE = b'"'[0]
+BACKSLASH = b'\\'[0]
+SKIP = True
 
 
 class UnexpectedSymbol(common.JSONError):
     def __init__(self, symbol, pos):
+        if isinstance(symbol, bytetype):
+            symbol = symbol.decode('utf-8', 'replace')
         super(UnexpectedSymbol, self).__init__(
             'Unexpected symbol %r at %d' % (symbol, pos)
         )
 
 
-def Lexer(f, buf_size=BUFSIZE):
-    if type(f.read(0)) == bytetype:
-        f = getreader('utf-8')(f)
-    buf = f.read(buf_size)
-    pos = 0
-    discarded = 0
-    while True:
-        match = LEXEME_RE.search(buf, pos)
-        if match:
-            lexeme = match.group()
-            if lexeme == '"':
-                pos = match.start()
-                start = pos + 1
-                while True:
-                    try:
-                        end = buf.index('"', start)
-                        escpos = end - 1
-                        while buf[escpos] == '\\':
-                            escpos -= 1
-                        if (end - escpos) % 2 == 0:
-                            start = end + 1
-                        else:
-                            break
-                    except ValueError:
-                        data = f.read(buf_size)
-                        if not data:
-                            raise common.IncompleteJSONError('Incomplete string lexeme')
-                        buf += data
-                yield discarded + pos, buf[pos:end + 1]
-                pos = end + 1
+class Lexer(object):
+    '''
+    Tokenizer over a file-like object. Iterating over a lexer yields
+    ``(offset, lexeme)`` tuples where ``lexeme`` is the bytes of a token of
+    the UTF-8 input and ``offset`` its absolute byte offset. Text input is
+    encoded as it is read, see Utf8Reader, so offsets are byte offsets in
+    either case and can be used to seek into the file.
+
+    The source text of already lexed tokens is normally dropped as soon as
+    the buffer is refilled. Calling ``retain(offset)`` keeps everything from
+    ``offset`` on available to ``text(start, end)`` until ``release()``.
+
+    Sending ``SKIP`` into the iterator right after it has yielded ``[`` or
+    ``{`` skips the rest of that container, see ``_skip``, and yields its
+    closing bracket.
+    '''
+    def __init__(self, f, buf_size=BUFSIZE):
+        if not isinstance(f.read(0), bytetype):
+            f = Utf8Reader(f)
+        self.f = f
+        self.buf_size = buf_size
+        self.buf = b''
+        self.discarded = 0
+        self.retained = None
+
+    def __iter__(self):
+        return self._lex()
+
+    def retain(self, offset):
+        self.retained = offset
+
+    def release(self):
+        self.retained = None
+
+    def text(self, start, end):
+        return self.buf[start - self.discarded:end - self.discarded]
+
+    def bytes_read(self):
+        '''
+        Returns the offset following the input read so far, which is the
+        size of the input once it has all been lexed.
+        '''
+        return self.discarded + len(self.buf)
+
+    def _lex(self):
+        f = self.f
+        buf_size = self.buf_size
+        buf = self.buf = f.read(buf_size)
+        pos = 0
+        discarded = 0
+        while True:
+            # The buffer is scanned with a single iterator over its lexemes,
+            # restarted only after a skip.
+            cut = False
+            length = len(buf)
+            for match in LEXEME_RE.finditer(buf, pos):
+                lexeme = match.group()
+                if match.end() == length and is_cut(lexeme):
+                    cut = True
+                    pos = match.start()
+                    break
+                skip = yield discarded + match.start(), lexeme
+                if skip is not None:
+                    buf, pos, discarded = self._skip(buf, match.end(), discarded)
+                    yield discarded + pos - 1, buf[pos - 1:pos]
+                    break
             else:
-                while match.end() == len(buf):
-                    data = f.read(buf_size)
+                data = f.read(buf_size)
+                if not data:
+                    break
+                buf, pos, discarded = self._refill(buf, discarded, data)
+                continue
+            if not cut:
+                continue
+
+            # The lexeme is cut by the end of the buffer. Its remainder
+            # is gathered in a list of chunks, each of them scanned once,
+            # and the buffer restarts from the chunk where it ends.
+            string = lexeme[0] == QUOTE
+            if string:
+                end, backslashes = string_end(buf, pos + 1)
+            keep = pos if self.retained is None else self.retained - discarded
+            chunks = [buf[keep:]]
+            offset = discarded + len(buf)
+            while True:
+                data = f.read(buf_size)
+                if string:
                     if not data:
-                        break
-                    buf += data
-                    match = LEXEME_RE.search(buf, pos)
-                    lexeme = match.group()
-                yield discarded + match.start(), lexeme
-                pos = match.end()
-        else:
-            data = f.read(buf_size)
-            if not data:
-                break
+                        raise common.IncompleteJSONError('Incomplete string lexeme')
+                    end, backslashes = string_end(data, 0, backslashes)
+                else:
+                    end = WORD_RE.match(data).end()
+                    if end == len(data):
+                        end = -1
+                chunks.append(data)
+                if end >= 0 or not data:
+                    break
+                offset += len(data)
+            if end < 0:
+                end = len(data)
+            start = discarded + pos
+            if self.retained is None:
+                buf = data
+                discarded = offset
+                pos = end
+                chunks[-1] = data[:end]
+                lexeme = b''.join(chunks)
+            else:
+                buf = b''.join(chunks)
+                discarded += keep
+                pos = offset - discarded + end
+                lexeme = buf[start - discarded:pos]
+            self.buf = buf
+            self.discarded = discarded
+            yield start, lexeme
+
+    def _refill(self, buf, discarded, data):
+        '''
+        Replaces the fully consumed buffer with the next chunk of data,
+        keeping the retained text if any. Returns the new buffer, the
+        position where the new data starts in it, and the new offset of the
+        buffer start.
+        '''
+        if self.retained is None:
             discarded += len(buf)
             buf = data
-            pos = 0
-
-
-def parse_value(lexer, symbol=None, pos=0):
-    try:
-        if symbol is None:
-            pos, symbol = next(lexer)
-        if symbol == 'null':
-            yield ('null', symbol)
-        elif symbol == 'true':
-            yield ('boolean', symbol)
-        elif symbol == 'false':
-            yield ('boolean', symbol)
-        elif symbol == '[':
-            for event in parse_array(lexer):
-                yield event
-        elif symbol == '{':
-            for event in parse_object(lexer):
-                yield event
-        elif symbol[0] == '"':
-            yield ('string', parse_string(symbol))
         else:
-            try:
-                yield ('number', symbol)
-            except decimal.InvalidOperation:
-                raise UnexpectedSymbol(symbol, pos)
-    except StopIteration:
-        raise common.IncompleteJSONError('Incomplete JSON data')
+            keep = self.retained - discarded
+            discarded += keep
+            buf = buf[keep:] + data
+        self.buf = buf
+        self.discarded = discarded
+        return buf, len(buf) - len(data), discarded
+
+    def _skip(self, buf, pos, discarded):
+        '''
+        Skips the rest of a container opened right before `pos` by counting
+        brackets outside of strings, without producing lexemes. The skipped
+        text is not validated. Returns the buffer, the position following
+        the closing bracket and the offset of the buffer start.
+        '''
+        depth = 1
+        backslashes = None
+        while True:
+            if backslashes is not None:
+                end, backslashes = string_end(buf, pos, backslashes)
+                if end >= 0:
+                    backslashes = None
+                    pos = end
+                    continue
+            else:
+                match = STRUCTURE_RE.search(buf, pos)
+                if match:
+                    char = match.group()
+                    pos = match.end()
+                    if char == b'"':
+                        backslashes = 0
+                    elif char == b'[' or char == b'{':
+                        depth += 1
+                    else:
+                        depth -= 1
+                        if not depth:
+                            return buf, pos, discarded
+                    continue
+            data = self.f.read(self.buf_size)
+            if not data:
+                raise common.IncompleteJSONError('Incomplete JSON data')
+            buf, pos, discarded = self._refill(buf, discarded, data)
+
+
+class Utf8Reader(object):
+    '''
+    Reader turning what a file-like object reads into bytes the Lexer can
+    scan: text is encoded to UTF-8 and memoryview slices are copied.
+    '''
+    def __init__(self, f):
+        self.f = f
+
+    def read(self, size):
+        data = self.f.read(size)
+        if isinstance(data, memoryview):
+            return data.tobytes()
+        return data.encode('utf-8')
+
+
+class PushLexer(object):
+    '''
+    Resumable tokenizer fed with chunks of input as they arrive, for sources
+    that can't be read from synchronously. ``feed(data)`` returns the list of
+    ``(offset, lexeme)`` tokens completed by `data`, as a Lexer yields them;
+    a lexeme cut by the end of a chunk is kept until a later chunk completes
+    it, or ``close()`` is called at the end of input. Text is encoded to
+    UTF-8.
+    '''
+    def __init__(self):
+        self.offset = 0
+        self.cut = None
+        self.backslashes = 0
+
+    def feed(self, data):
+        if not isinstance(data, bytetype):
+            data = data.tobytes() if isinstance(data, memoryview) else data.encode('utf-8')
+        tokens = []
+        offset = self.offset
+        self.offset += len(data)
+        pos = 0
+        if self.cut is not None:
+            start, chunks = self.cut
+            if chunks[0][0] == QUOTE:
+                end, self.backslashes = string_end(data, 0, self.backslashes)
+            else:
+                end = WORD_RE.match(data).end()
+                if end == len(data):
+                    end = -1
+            if end < 0:
+                chunks.append(data)
+                return tokens
+            chunks.append(data[:end])
+            tokens.append((start, b''.join(chunks)))
+            self.cut = None
+            pos = end
+        append = tokens.append
+        length = len(data)
+        for match in LEXEME_RE.finditer(data, pos):
+            lexeme = match.group()
+            if match.end() == length and is_cut(lexeme):
+                if lexeme[0] == QUOTE:
+                    self.backslashes = string_end(lexeme, 1)[1]
+                self.cut = (offset + match.start(), [lexeme])
+                break
+            append((offset + match.start(), lexeme))
+        return tokens
+
+    def close(self):
+        tokens = []
+        if self.cut is not None:
+            start, chunks = self.cut
+            if chunks[0][0] == QUOTE:
+                raise common.IncompleteJSONError('Incomplete string lexeme')
+            tokens.append((start, b''.join(chunks)))
+            self.cut = None
+        return tokens
+
+
+class TokenQueue(deque):
+    '''
+    Queue of tokens that parse_tokens can iterate over while more tokens are
+    being appended. Running out of tokens ends the iteration only until the
+    next append, so the grammar must only be resumed while the queue holds
+    at least two tokens, see grammar, or once the input is over, as Parser
+    does.
+    '''
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return self.popleft()
+        except IndexError:
+            raise StopIteration
+
+    next = __next__
+
+
+def is_cut(lexeme):
+    '''
+    Tells whether a lexeme found at the end of the input may continue past
+    it: a word or a string with no closing quote.
+    '''
+    if lexeme[0] == QUOTE:
+        return string_end(lexeme, 1)[0] < 0
+    return WORD_RE.match(lexeme).end() > 0
+
+
+def string_end(data, start, backslashes=0):
+    """
+    Looks for the closing quote of a string lexeme in `data` from `start` on,
+    with `backslashes` being the number of backslashes right before `start`.
+
+    Returns a tuple ``(end, backslashes)``. `end` is the index following the
+    quote, or -1 if `data` ends inside the string, and then `backslashes` is
+    the number of backslashes the next chunk of the string starts after.
+    """
+    first = start
+    while True:
+        end = data.find(b'"', start)
+        if end < 0:
+            end = len(data)
+        escpos = end - 1
+        while escpos >= first and data[escpos] == BACKSLASH:
+            escpos -= 1
+        count = end - 1 - escpos
+        if escpos < first:
+            count += backslashes
+        if end == len(data):
+            return -1, count
+        if count % 2 == 0:
+            return end + 1, 0
+        start = end + 1
 
 
 def parse_string(symbol):
-    return scanstring(symbol, 1)[0]
+    return scanstring(symbol.decode('utf-8'), 1)[0]
 
 
-def parse_array(lexer):
-    yield ('start_array', None)
-    try:
-        pos, symbol = next(lexer)
-        if symbol != ']':
-            while True:
-                for event in parse_value(lexer, symbol, pos):
-                    yield event
-                pos, symbol = next(lexer)
-                if symbol == ']':
-                    break
-                if symbol != ',':
-                    raise UnexpectedSymbol(symbol, pos)
-                pos, symbol = next(lexer)
-        yield ('end_array', None)
-    except StopIteration:
-        raise common.IncompleteJSONError('Incomplete JSON data')
+def grammar(names):
+    '''
+    Builds a parse_tokens function yielding event types from `names`, a
+    sequence indexed by the event codes of enumjson.common: either the event
+    names or the codes themselves.
 
+    The grammar is a single loop over the tokens with an explicit stack of
+    the open containers, so every event is yielded once whatever its depth.
+    It never consumes more than two tokens between two events, which lets it
+    run over a TokenQueue filled as input arrives, and the token an event
+    comes from is always the last one consumed when it is yielded.
+    '''
+    NULL, BOOLEAN, NUMBER, STRING, MAP_KEY, START_MAP, END_MAP, START_ARRAY, END_ARRAY = names
 
-def parse_object(lexer):
-    yield ('start_map', None)
-    try:
-        pos, symbol = next(lexer)
-        if symbol != '}':
-            while True:
-                if symbol[0] != '"':
-                    raise UnexpectedSymbol(symbol, pos)
-                yield ('map_key', parse_string(symbol))
-                pos, symbol = next(lexer)
-                if symbol != ':':
-                    raise UnexpectedSymbol(symbol, pos)
-                for event in parse_value(lexer, None, pos):
-                    yield event
-                pos, symbol = next(lexer)
-                if symbol == '}':
-                    break
-                if symbol != ',':
-                    raise UnexpectedSymbol(symbol, pos)
+    def parse_tokens(lexer, skipper=None, number=None, multiple_values=False, document=None):
+        '''
+        Iterator yielding unprefixed events from an iterator over
+        ``(offset, lexeme)`` tokens as a Lexer yields them. Skipping
+        containers through `skipper` requires the iterator of a Lexer.
+        Lexemes are only decoded when they are strings or numbers, the
+        latter being converted with `number` if given.
+
+        With `multiple_values` the tokens hold any number of concatenated
+        values, and `document` is called if given with the offset of the
+        first token of each of them.
+        '''
+        # closing symbols of the open containers
+        stack = []
+        quote = QUOTE
+        values = 0
+        while True:
+            try:
                 pos, symbol = next(lexer)
-        yield ('end_map', None)
-    except StopIteration:
-        raise common.IncompleteJSONError('Incomplete JSON data')
+            except StopIteration:
+                if values or multiple_values:
+                    return
+                raise common.IncompleteJSONError('Incomplete JSON data')
+            if values and not multiple_values:
+                raise common.JSONError('Additional data')
+            values += 1
+            if document is not None:
+                document(pos)
+            key = False
+            try:
+                while True:
+                    # `symbol` starts a value, preceded by its key in a map
+                    if key:
+                        if symbol[0] != quote:
+                            raise UnexpectedSymbol(symbol, pos)
+                        yield (MAP_KEY, parse_string(symbol))
+                        pos, symbol = next(lexer)
+                        if symbol != b':':
+                            raise UnexpectedSymbol(symbol, pos)
+                        pos, symbol = next(lexer)
+                    if symbol == b'[' or symbol == b'{':
+                        if symbol == b'[':
+                            start, end, closing = START_ARRAY, END_ARRAY, b']'
+                        else:
+                            start, end, closing = START_MAP, END_MAP, b'}'
+                        yield (start, None)
+                        if skipper is not None and skipper.skip:
+                            skipper.skip = False
+                            lexer.send(SKIP)
+                            yield (end, None)
+                        else:
+                            pos, symbol = next(lexer)
+                            if symbol != closing:
+                                stack.append(closing)
+                                key = closing == b'}'
+                                continue
+                            yield (end, None)
+                    elif symbol == b'null':
+                        yield (NULL, 'null')
+                    elif symbol == b'true':
+                        yield (BOOLEAN, 'true')
+                    elif symbol == b'false':
+                        yield (BOOLEAN, 'false')
+                    elif symbol[0] == quote:
+                        yield (STRING, parse_string(symbol))
+                    elif NUMBER_RE.match(symbol):
+                        symbol = symbol.decode('ascii')
+                        yield (NUMBER, symbol if number is None else number(symbol))
+                    else:
+                        raise UnexpectedSymbol(symbol, pos)
+
+                    # the value is complete: close the containers ending
+                    # after it, up to the one going on with another value
+                    while stack:
+                        pos, symbol = next(lexer)
+                        if symbol == stack[-1]:
+                            stack.pop()
+                            yield (END_ARRAY if symbol == b']' else END_MAP, None)
+                        elif symbol == b',':
+                            key = stack[-1] == b'}'
+                            pos, symbol = next(lexer)
+                            break
+                        else:
+                            raise UnexpectedSymbol(symbol, pos)
+                    else:
+                        break
+            except StopIteration:
+                raise common.IncompleteJSONError('Incomplete JSON data')
 
+    return parse_tokens
 
-def basic_parse(file, buf_size=BUFSIZE):
+
+parse_tokens = grammar(common.EVENT_NAMES)
+parse_code_tokens = grammar(range(len(common.EVENT_NAMES)))
+
+
+def basic_parse(file, buf_size=BUFSIZE, skipper=None, codes=False, number=None,
+                multiple_values=False, offsets=None):
     '''
     Iterator yielding unprefixed events.
 
     Parameters:
 
     - file: a readable file-like object with JSON input
+    - buf_size: a size of an input buffer
+    - skipper: an enumjson.common.Skipper through which the consumer can
+      skip containers; their content is only scanned for brackets
+    - codes: if True, event types are the integer codes of enumjson.common
+    - number: a callable converting number lexemes, such as
+      enumjson.common.number or decimal.Decimal; they are yielded as text
+      by default
+    - multiple_values: allows the input to hold several concatenated JSON
+      values, such as the lines of JSON Lines
+    - offsets: an enumjson.common.DocumentOffsets receiving the byte offset
+      of each of those values, implies multiple_values
     '''
-    lexer = iter(Lexer(file, buf_size))
-    for value in parse_value(lexer):
-        yield value
-    try:
-        next(lexer)
-    except StopIteration:
-        pass
-    else:
-        raise common.JSONError('Additional data')
+    tokens = parse_code_tokens if codes else parse_tokens
+    if offsets is None:
+        return tokens(iter(Lexer(file, buf_size)), skipper, number, multiple_values)
+    return tokens(iter(Lexer(file, buf_size)), skipper, number, True, offsets.append)
 
 
-def parse(file, buf_size=BUFSIZE):
+def parse(file, buf_size=BUFSIZE, skipper=None, codes=False, number=None, **config):
     '''
     Backend-specific wrapper for enumjson.common.parse.
     '''
-    return common.parse(basic_parse(file, buf_size=buf_size))
+    return common.parse(basic_parse(file, buf_size=buf_size, skipper=skipper, codes=codes,
+                                    number=number, **config),
+                        codes=codes)
 
 
-def items(file, prefix):
+class Parser(object):
+    '''
+    Push interface of the backend, for input arriving in chunks that can't
+    be read from a file-like object::
+
+        parser = Parser()
+        for chunk in chunks:
+            parser.feed(chunk)
+            for event in parser.events():
+                ...
+        parser.close()
+        for event in parser.events():
+            ...
+
+    ``feed`` takes bytes or text and ``close`` ends the input. Both parse as
+    far as the data allows, raising JSONError on invalid input, and the
+    unprefixed events produced so far are taken with ``events``. `codes`,
+    `number` and `multiple_values` are the options of ``basic_parse``.
+    '''
+    def __init__(self, codes=False, number=None, multiple_values=False):
+        self.lexer = PushLexer()
+        self.tokens = TokenQueue()
+        tokens = parse_code_tokens if codes else parse_tokens
+        self.parser = tokens(self.tokens, None, number, multiple_values)
+        self.closed = False
+        self.pending = []
+
+    def feed(self, data):
+        if self.closed:
+            raise ValueError('Parser is closed')
+        self.tokens.extend(self.lexer.feed(data))
+        self._run()
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.tokens.extend(self.lexer.close())
+            self._run()
+
+    def events(self):
+        events = self.pending
+        self.pending = []
+        return events
+
+    def _run(self):
+        # the grammar may only run out of tokens once the input is over
+        tokens = self.tokens
+        append = self.pending.append
+        while len(tokens) >= 2 or self.closed:
+            try:
+                append(next(self.parser))
+            except StopIteration:
+                break
+
+
+def raw_items(file, prefix, buf_size=BUFSIZE):
+    '''
+    An iterator returning the source JSON text of the items under a given
+    prefix. Instead of rebuilding the text from events, the span between
+    the first and the last token of every item is sliced out of the lexer
+    buffer, so the original formatting is preserved.
+    '''
+    lexer = Lexer(file, buf_size)
+    last = [None]
+
+    def tracked():
+        for token in lexer:
+            last[0] = token
+            yield token
+
+    events = common.parse(parse_tokens(tracked()))
+    for current, event, value in events:
+        if current != prefix:
+            continue
+        pos, symbol = last[0]
+        if event in ('start_map', 'start_array'):
+            lexer.retain(pos)
+            end_event = event.replace('start', 'end')
+            while (current, event) != (prefix, end_event):
+                current, event, value = next(events)
+            end, symbol = last[0]
+            yield lexer.text(pos, end + len(symbol)).decode('utf-8')
+            lexer.release()
+        else:
+            yield symbol.decode('utf-8')
+
+
+def items(file, prefix, raw=False, as_objects=False, number=None, skip=False,
+          buf_size=BUFSIZE):
     '''
     Backend-specific wrapper for enumjson.common.items.
+
+    With ``raw=True`` items are returned as their original source text,
+    see ``raw_items``. With ``skip=True`` containers that can't hold the
+    prefix are skipped without validating their content.
+    '''
+    if raw:
+        return raw_items(file, prefix, buf_size=buf_size)
+    skipper = common.Skipper() if skip else None
+    return common.items(parse(file, buf_size=buf_size, skipper=skipper), prefix,
+                        as_objects=as_objects, number=number, skipper=skipper)
+
+
+def multi_items(file, patterns, as_objects=False, number=None, skip=False):
+    '''
+    Backend-specific wrapper for enumjson.common.multi_items.
+    '''
+    skipper = common.Skipper() if skip else None
+    return common.multi_items(basic_parse(file, skipper=skipper), patterns,
+                              as_objects=as_objects, number=number, skipper=skipper)
+
+
+def iter_documents(file, as_objects=False, number=None, buf_size=BUFSIZE):
+    '''
+    Backend-specific wrapper for enumjson.common.iter_documents, over a file
+    of concatenated JSON values such as JSON Lines.
+    '''
+    offsets = common.DocumentOffsets()
+    return common.iter_documents(basic_parse(file, buf_size=buf_size, offsets=offsets), offsets,
+                                 as_objects=as_objects, number=number)
+
+
+def items_per_document(file, prefix, as_objects=False, number=None, buf_size=BUFSIZE):
+    '''
+    Backend-specific wrapper for enumjson.common.items_per_document.
     '''
-    return common.items(parse(file), prefix)
+    offsets = common.DocumentOffsets()
+    return common.items_per_document(basic_parse(file, buf_size=buf_size, offsets=offsets),
+                                     offsets, prefix, as_objects=as_objects, number=number)
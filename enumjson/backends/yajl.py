@@ -6,13 +6,14 @@ from ctypes import Structure, c_uint, c_ubyte, c_int, c_long, c_double, c_char,
                    c_void_p, c_char_p, CFUNCTYPE, POINTER, byref, string_at, cast
 
 from enumjson import common, backends
-from enumjson.compat import b2s
+from enumjson.compat import b2s, b2s_replace
 
 
 yajl = backends.find_yajl_ctypes(1)
 
 yajl.yajl_alloc.restype = POINTER(c_char)
 yajl.yajl_get_error.restype = POINTER(c_char)
+yajl.yajl_get_bytes_consumed.restype = c_uint
 
 C_EMPTY = CFUNCTYPE(c_int, c_void_p)
 C_INT = CFUNCTYPE(c_int, c_void_p, c_int)
@@ -25,16 +26,16 @@ _callback_data = [
     # Mapping of JSON parser events to callback C types and value converters.
     # Used to define the Callbacks structure and actual callback functions
     # inside the parse function.
-    ('null', C_EMPTY, lambda: None),
-    ('boolean', C_INT, lambda v: bool(v)),
+    ('null', C_EMPTY, lambda: 'null'),
+    ('boolean', C_INT, lambda v: 'true' if v else 'false'),
     # "integer" and "double" aren't actually yielded by yajl since "number"
     # takes precedence if defined
     ('integer', C_LONG, lambda v, l: int(string_at(v, l))),
     ('double', C_DOUBLE, lambda v, l: float(string_at(v, l))),
-    ('number', C_STR, lambda v, l: common.number(b2s(string_at(v, l)))),
-    ('string', C_STR, lambda v, l: string_at(v, l).decode('utf-8')),
+    ('number', C_STR, lambda v, l: b2s(string_at(v, l))),
+    ('string', C_STR, lambda v, l: string_at(v, l).decode('utf-8', 'replace')),
     ('start_map', C_EMPTY, lambda: None),
-    ('map_key', C_STR, lambda v, l: b2s(string_at(v, l))),
+    ('map_key', C_STR, lambda v, l: b2s_replace(string_at(v, l))),
     ('end_map', C_EMPTY, lambda: None),
     ('start_array', C_EMPTY, lambda: None),
     ('end_array', C_EMPTY, lambda: None),
@@ -55,60 +56,196 @@ YAJL_INSUFFICIENT_DATA = 2
 YAJL_ERROR = 3
 
 
-def basic_parse(f, allow_comments=False, check_utf8=False, buf_size=64 * 1024):
+def _parse_chunks(f, allow_comments, check_utf8, buf_size, skipping, codes, number, partial,
+                  offsets=None):
     '''
-    Iterator yielding unprefixed events.
-
-    Parameters:
-
-    - f: a readable file-like object with JSON input
-    - allow_comments: tells parser to allow comments in JSON input
-    - check_utf8: if True, parser will cause an error if input is invalid utf-8
-    - buf_size: a size of an input buffer
+    Iterator yielding the events produced from each chunk of input as a new
+    list. `skipping` is a list holding the depth of the container being
+    skipped, callbacks drop events while it is not zero. With `codes` event
+    types are the integer codes of enumjson.common, and number lexemes are
+    converted with `number` if given. With `partial` truncated input isn't
+    an error. With `offsets` the input is a stream of concatenated values,
+    see enumjson.backends.DocumentSplitter.
     '''
     events = []
 
     def callback(event, func_type, func):
+        if event == 'number' and number is not None:
+            func = lambda v, l: number(b2s(string_at(v, l)))
+        depth = backends.DEPTH_CHANGE.get(event, 0)
+        if codes:
+            event = common.EVENT_CODES.get(event, event)
         def c_callback(context, *args):
+            if skipping[0]:
+                # inside a skipped container only the depth is tracked
+                skipping[0] += depth
+                if not skipping[0]:
+                    events.append((event, None))
+                return 1
             events.append((event, func(*args)))
             return 1
         return func_type(c_callback)
 
     callbacks = Callbacks(*[callback(*data) for data in _callback_data])
     config = Config(allow_comments, check_utf8)
-    handle = yajl.yajl_alloc(byref(callbacks), byref(config), None, None)
+    handle = [yajl.yajl_alloc(byref(callbacks), byref(config), None, None)]
+    result = [YAJL_OK]
+
+    def parse(buffer, start=0):
+        data = backends.c_buffer(buffer)
+        length = len(buffer) - start
+        pointer = backends.c_pointer(data, start) if start else data
+        if length:
+            result[0] = yajl.yajl_parse(handle[0], pointer, length)
+        else:
+            result[0] = yajl.yajl_parse_complete(handle[0])
+        if result[0] == YAJL_ERROR:
+            perror = yajl.yajl_get_error(handle[0], 1, pointer, length)
+            error = cast(perror, c_char_p).value
+            yajl.yajl_free_error(handle[0], perror)
+            exception = common.IncompleteJSONError if result[0] == YAJL_INSUFFICIENT_DATA else common.JSONError
+            raise common.JSONError(error)
+        return yajl.yajl_get_bytes_consumed(handle[0])
+
+    def renew():
+        yajl.yajl_free(handle[0])
+        handle[0] = yajl.yajl_alloc(byref(callbacks), byref(config), None, None)
+
+    if offsets is not None:
+        splitter = backends.DocumentSplitter(offsets)
+        parse_chunk = lambda buffer: splitter.parse(buffer, parse, renew)
+    else:
+        parse_chunk = parse
     try:
         while True:
             buffer = f.read(buf_size)
-            if buffer:
-                result = yajl.yajl_parse(handle, buffer, len(buffer))
-            else:
-                result = yajl.yajl_parse_complete(handle)
-            if result == YAJL_ERROR:
-                perror = yajl.yajl_get_error(handle, 1, buffer, len(buffer))
-                error = cast(perror, c_char_p).value
-                yajl.yajl_free_error(handle, perror)
-                exception = common.IncompleteJSONError if result == YAJL_INSUFFICIENT_DATA else common.JSONError
-                raise common.JSONError(error)
+            result[0] = YAJL_OK
+            parse_chunk(buffer)
             if not buffer and not events:
-                if result == YAJL_INSUFFICIENT_DATA:
+                if result[0] == YAJL_INSUFFICIENT_DATA and not partial:
                     raise common.IncompleteJSONError('Incomplete JSON data')
                 break
 
-            for event in events:
-                yield event
+            if events:
+                yield events
             events = []
     finally:
-        yajl.yajl_free(handle)
+        yajl.yajl_free(handle[0])
+
+def basic_parse(f, allow_comments=False, check_utf8=False, buf_size=64 * 1024,
+                skipper=None, codes=False, number=None, trusted=False, multiple_values=False,
+                offsets=None):
+    '''
+    Iterator yielding unprefixed events.
+
+    Parameters:
+
+    - f: a readable file-like object with JSON input
+    - allow_comments: tells parser to allow comments in JSON input
+    - check_utf8: if True, parser will cause an error if input is invalid utf-8,
+      otherwise invalid utf-8 in strings and map keys is replaced with U+FFFD
+    - buf_size: a size of an input buffer
+    - skipper: an enumjson.common.Skipper through which the consumer can
+      skip containers
+    - codes: if True, event types are the integer codes of enumjson.common
+    - number: a callable converting number lexemes, such as
+      enumjson.common.number or decimal.Decimal; they are yielded as text
+      by default
+    - trusted: fast mode for input known to be valid, as for the yajl 2
+      backends: utf-8 isn't checked whatever check_utf8 is, and truncated
+      input ends the events instead of raising an error
+    - multiple_values: allows the input to hold several concatenated JSON
+      values, such as the lines of JSON Lines
+    - offsets: an enumjson.common.DocumentOffsets receiving the byte offset
+      of each of those values, implies multiple_values
+    '''
+    skipping = [0]
+    check_utf8 = check_utf8 and not trusted
+    if multiple_values and offsets is None:
+        offsets = common.DocumentOffsets((), 0)
+    for events in _parse_chunks(f, allow_comments, check_utf8, buf_size, skipping, codes, number,
+                                trusted, offsets):
+        index = 0
+        while index < len(events):
+            event = events[index]
+            index += 1
+            yield event
+            if skipper is not None and skipper.skip:
+                skipper.skip = False
+                index, skipping[0] = backends.skip_events(events, index)
+                if not skipping[0]:
+                    yield events[index - 1]
+
+
+def basic_parse_batches(f, allow_comments=False, check_utf8=False, buf_size=64 * 1024,
+                        codes=False, number=None, trusted=False, multiple_values=False):
+    '''
+    Iterator yielding lists of unprefixed events, one list per chunk of
+    input. Takes the same parameters as basic_parse except for `skipper`
+    and `offsets`.
+    '''
+    offsets = common.DocumentOffsets((), 0) if multiple_values else None
+    return _parse_chunks(f, allow_comments, check_utf8 and not trusted, buf_size, [0], codes,
+                         number, trusted, offsets)
 
-def parse(file, **kwargs):
+def parse(file, codes=False, **kwargs):
     '''
     Backend-specific wrapper for enumjson.common.parse.
     '''
-    return common.parse(basic_parse(file, **kwargs))
+    return common.parse(basic_parse(file, codes=codes, **kwargs), codes=codes)
+
+def parse_batches(file, codes=False, **kwargs):
+    '''
+    Backend-specific wrapper for enumjson.common.parse_batches.
+    '''
+    return common.parse_batches(basic_parse_batches(file, codes=codes, **kwargs),
+                                codes=codes)
+
+def items(file, prefix, as_objects=False, number=None, skip=False, **config):
+    '''
+    Backend-specific wrapper for enumjson.common.items. `config` are the
+    parser options of basic_parse, such as trusted.
+    '''
+    skipper = common.Skipper() if skip else None
+    return common.items(parse(file, skipper=skipper, **config), prefix,
+                        as_objects=as_objects, number=number, skipper=skipper)
+
+
+def multi_items(file, patterns, as_objects=False, number=None, skip=False, **config):
+    '''
+    Backend-specific wrapper for enumjson.common.multi_items. `config` are
+    the parser options of basic_parse.
+    '''
+    skipper = common.Skipper() if skip else None
+    return common.multi_items(basic_parse(file, skipper=skipper, **config), patterns,
+                              as_objects=as_objects, number=number, skipper=skipper)
+
+
+def items_batches(file, prefix, as_objects=False, number=None, **config):
+    '''
+    Backend-specific wrapper for enumjson.common.items_batches. `config`
+    are the parser options of basic_parse_batches.
+    '''
+    return common.items_batches(parse_batches(file, **config), prefix,
+                                as_objects=as_objects, number=number)
+
+
+def iter_documents(file, as_objects=False, number=None, **config):
+    '''
+    Backend-specific wrapper for enumjson.common.iter_documents, over a file
+    of concatenated JSON values such as JSON Lines. `config` are the parser
+    options of basic_parse.
+    '''
+    offsets = common.DocumentOffsets()
+    return common.iter_documents(basic_parse(file, offsets=offsets, **config), offsets,
+                                 as_objects=as_objects, number=number)
+
 
-def items(file, prefix):
+def items_per_document(file, prefix, as_objects=False, number=None, **config):
     '''
-    Backend-specific wrapper for enumjson.common.items.
+    Backend-specific wrapper for enumjson.common.items_per_document. `config`
+    are the parser options of basic_parse.
     '''
-    return common.items(parse(file), prefix)
+    offsets = common.DocumentOffsets()
+    return common.items_per_document(basic_parse(file, offsets=offsets, **config), offsets,
+                                     prefix, as_objects=as_objects, number=number)
@@ -2,28 +2,30 @@
 Wrapper for YAJL C library version 2.x.
 '''
 
-from ctypes import Structure, c_uint, c_ubyte, c_int, c_long, c_double, c_char, \
-                   c_void_p, c_char_p, CFUNCTYPE, POINTER, byref, string_at, cast
+from ctypes import Structure, c_uint, c_ubyte, c_int, c_long, c_double, c_char, c_size_t, \
+                   c_char_p, py_object, CFUNCTYPE, POINTER, byref, string_at, cast
 
 from enumjson import common, backends
-from enumjson.compat import b2s
+from enumjson.compat import b2s, b2s_replace
 
 
 yajl = backends.find_yajl_ctypes(2)
 
 yajl.yajl_alloc.restype = POINTER(c_char)
 yajl.yajl_get_error.restype = POINTER(c_char)
+yajl.yajl_get_bytes_consumed.restype = c_size_t
 
-C_EMPTY = CFUNCTYPE(c_int, c_void_p)
-C_INT = CFUNCTYPE(c_int, c_void_p, c_int)
-C_LONG = CFUNCTYPE(c_int, c_void_p, c_long)
-C_DOUBLE = CFUNCTYPE(c_int, c_void_p, c_double)
-C_STR = CFUNCTYPE(c_int, c_void_p, POINTER(c_ubyte), c_uint)
+# The context passed to the callbacks is the Events list to fill
+C_EMPTY = CFUNCTYPE(c_int, py_object)
+C_INT = CFUNCTYPE(c_int, py_object, c_int)
+C_LONG = CFUNCTYPE(c_int, py_object, c_long)
+C_DOUBLE = CFUNCTYPE(c_int, py_object, c_double)
+C_STR = CFUNCTYPE(c_int, py_object, POINTER(c_ubyte), c_uint)
 
 _callback_data = [
     # Mapping of JSON parser events to callback C types and value converters.
-    # Used to define the Callbacks structure and actual callback functions
-    # inside the parse function.
+    # Used to define the Callbacks structure and the callback functions
+    # shared by all parsers.
     ('null', C_EMPTY, lambda: 'null'),
     ('boolean', C_INT, lambda v: 'true' if v else 'false'),
     # "integer" and "double" aren't actually yielded by yajl since "number"
@@ -31,9 +33,9 @@ _callback_data = [
     ('integer', C_LONG, lambda v, l: string_at(v, l)),
     ('double', C_DOUBLE, lambda v, l: string_at(v, l)),
     ('number', C_STR, lambda v, l: b2s(string_at(v, l))),
-    ('string', C_STR, lambda v, l: string_at(v, l).decode('utf-8')),
+    ('string', C_STR, lambda v, l: string_at(v, l).decode('utf-8', 'replace')),
     ('start_map', C_EMPTY, lambda: None),
-    ('map_key', C_STR, lambda v, l: b2s(string_at(v, l))),
+    ('map_key', C_STR, lambda v, l: b2s_replace(string_at(v, l))),
     ('end_map', C_EMPTY, lambda: None),
     ('start_array', C_EMPTY, lambda: None),
     ('end_array', C_EMPTY, lambda: None),
@@ -52,8 +54,94 @@ YAJL_ALLOW_COMMENTS = 1
 YAJL_MULTIPLE_VALUES = 8
 
 
+def callback(event, func_type, func):
+    depth = backends.DEPTH_CHANGE.get(event, 0)
+    def c_callback(events, *args):
+        if events.skipping:
+            # inside a skipped container only the depth is tracked
+            events.skipping += depth
+            if not events.skipping:
+                events.append((event, None))
+            return 1
+        events.append((event, func(*args)))
+        return 1
+    return func_type(c_callback)
+
+
+def number_callback(event):
+    def c_callback(events, v, l):
+        # the conversion is chosen per parser; numbers don't change the
+        # depth of a skipped container
+        if not events.skipping:
+            value = b2s(string_at(v, l))
+            if events.number is not None:
+                value = events.number(value)
+            events.append((event, value))
+        return 1
+    return C_STR(c_callback)
+
+
+def callbacks(codes):
+    '''
+    Builds the Callbacks of the parsers yielding event names, or the integer
+    codes of enumjson.common with `codes`, so that the event type appended
+    by every callback is bound once.
+    '''
+    functions = []
+    for name, func_type, func in _callback_data:
+        event = common.EVENT_CODES.get(name, name) if codes else name
+        if name == 'number':
+            functions.append(number_callback(event))
+        else:
+            functions.append(callback(event, func_type, func))
+    return Callbacks(*functions)
+
+
+# Built once and shared by all parsers
+_callbacks = callbacks(False)
+_code_callbacks = callbacks(True)
+
+
+class Parser(backends.YajlParser):
+    '''
+    Reusable parser, see enumjson.backends.YajlParser. Takes the
+    `codes` and `number` options of basic_parse and the yajl options of
+    enumjson.backends.yajl2_options.
+    '''
+    def _context(self, events):
+        return py_object(events)
+
+    def _alloc(self):
+        table = _code_callbacks if self.codes else _callbacks
+        handle = yajl.yajl_alloc(byref(table), None, self.context)
+        for option in self.options:
+            yajl.yajl_config(handle, option, 1)
+        return handle
+
+    def _parse(self, buffer, start=0):
+        handle = self.handle
+        data = backends.c_buffer(buffer)
+        length = len(buffer) - start
+        pointer = backends.c_pointer(data, start) if start else data
+        if length:
+            result = yajl.yajl_parse(handle, pointer, length)
+        else:
+            result = yajl.yajl_complete_parse(handle)
+        if result != YAJL_OK:
+            perror = yajl.yajl_get_error(handle, 1, pointer, length)
+            error = cast(perror, c_char_p).value
+            yajl.yajl_free_error(handle, perror)
+            exception = common.IncompleteJSONError if result == YAJL_INSUFFICIENT_DATA else common.JSONError
+            raise exception(error.decode('utf-8', 'replace'))
+        return yajl.yajl_get_bytes_consumed(handle)
+
+    def _free(self, handle):
+        yajl.yajl_free(handle)
+
+
 def basic_parse(f, allow_comments=False, buf_size=64 * 1024,
-                multiple_values=False):
+                multiple_values=False, skipper=None, codes=False, number=None, offsets=None,
+                **config):
     '''
     Iterator yielding unprefixed events.
 
@@ -63,51 +151,96 @@ def basic_parse(f, allow_comments=False, buf_size=64 * 1024,
     - allow_comments: tells parser to allow comments in JSON input
     - buf_size: a size of an input buffer
     - multiple_values: allows the parser to parse multiple JSON objects
+    - skipper: an enumjson.common.Skipper through which the consumer can
+      skip containers
+    - codes: if True, event types are the integer codes of enumjson.common
+    - number: a callable converting number lexemes, such as
+      enumjson.common.number or decimal.Decimal; they are yielded as text
+      by default
+    - offsets: an enumjson.common.DocumentOffsets receiving the byte offset
+      of each value of a stream of concatenated JSON values, such as JSON
+      Lines, which are then parsed one at a time with a yajl handle each;
+      on small documents this is about 1.5 times as slow as
+      multiple_values, which is preferable when the offsets aren't needed
+    - trusted: fast mode for input known to be valid, strings aren't
+      validated and truncated input isn't an error; this and the other yajl
+      options are described in enumjson.backends.yajl2_options
+
+    Use a Parser to parse many documents with the same options.
     '''
-    events = []
+    parser = Parser(codes, number, allow_comments=allow_comments,
+                    multiple_values=multiple_values, **config)
+    return parser.basic_parse(f, buf_size, skipper, offsets)
 
-    def callback(event, func_type, func):
-        def c_callback(context, *args):
-            events.append((event, func(*args)))
-            return 1
-        return func_type(c_callback)
-
-    callbacks = Callbacks(*[callback(*data) for data in _callback_data])
-    handle = yajl.yajl_alloc(byref(callbacks), None, None)
-    if allow_comments:
-        yajl.yajl_config(handle, YAJL_ALLOW_COMMENTS, 1)
-    if multiple_values:
-        yajl.yajl_config(handle, YAJL_MULTIPLE_VALUES, 1)
-    try:
-        while True:
-            buffer = f.read(buf_size)
-            if buffer:
-                result = yajl.yajl_parse(handle, buffer, len(buffer))
-            else:
-                result = yajl.yajl_complete_parse(handle)
-            if result != YAJL_OK:
-                perror = yajl.yajl_get_error(handle, 1, buffer, len(buffer))
-                error = cast(perror, c_char_p).value
-                yajl.yajl_free_error(handle, perror)
-                exception = common.IncompleteJSONError if result == YAJL_INSUFFICIENT_DATA else common.JSONError
-                raise exception(error.decode('utf-8'))
-            if not buffer and not events:
-                break
-
-            for event in events:
-                yield event
-            events = []
-    finally:
-        yajl.yajl_free(handle)
 
-def parse(file, **kwargs):
+def basic_parse_batches(f, allow_comments=False, buf_size=64 * 1024,
+                        multiple_values=False, codes=False, number=None, **config):
+    '''
+    Iterator yielding lists of unprefixed events, one list per chunk of
+    input. Takes the same parameters as basic_parse except for `skipper`.
+    '''
+    parser = Parser(codes, number, allow_comments=allow_comments,
+                    multiple_values=multiple_values, **config)
+    return parser.basic_parse_batches(f, buf_size)
+
+def parse(file, codes=False, **kwargs):
     '''
     Backend-specific wrapper for enumjson.common.parse.
     '''
-    return common.parse(basic_parse(file, **kwargs))
+    return common.parse(basic_parse(file, codes=codes, **kwargs), codes=codes)
+
+def parse_batches(file, codes=False, **kwargs):
+    '''
+    Backend-specific wrapper for enumjson.common.parse_batches.
+    '''
+    return common.parse_batches(basic_parse_batches(file, codes=codes, **kwargs),
+                                codes=codes)
+
+def items(file, prefix, as_objects=False, number=None, skip=False, **config):
+    '''
+    Backend-specific wrapper for enumjson.common.items. `config` are the
+    parser options of basic_parse, such as trusted.
+    '''
+    skipper = common.Skipper() if skip else None
+    return common.items(parse(file, skipper=skipper, **config), prefix,
+                        as_objects=as_objects, number=number, skipper=skipper)
+
+
+def multi_items(file, patterns, as_objects=False, number=None, skip=False, **config):
+    '''
+    Backend-specific wrapper for enumjson.common.multi_items. `config` are
+    the parser options of basic_parse.
+    '''
+    skipper = common.Skipper() if skip else None
+    return common.multi_items(basic_parse(file, skipper=skipper, **config), patterns,
+                              as_objects=as_objects, number=number, skipper=skipper)
+
+
+def items_batches(file, prefix, as_objects=False, number=None, **config):
+    '''
+    Backend-specific wrapper for enumjson.common.items_batches. `config`
+    are the parser options of basic_parse_batches.
+    '''
+    return common.items_batches(parse_batches(file, **config), prefix,
+                                as_objects=as_objects, number=number)
+
+
+def iter_documents(file, as_objects=False, number=None, **config):
+    '''
+    Backend-specific wrapper for enumjson.common.iter_documents, over a file
+    of concatenated JSON values such as JSON Lines. `config` are the parser
+    options of basic_parse.
+    '''
+    offsets = common.DocumentOffsets()
+    return common.iter_documents(basic_parse(file, offsets=offsets, **config), offsets,
+                                 as_objects=as_objects, number=number)
+
 
-def items(file, prefix):
+def items_per_document(file, prefix, as_objects=False, number=None, **config):
     '''
-    Backend-specific wrapper for enumjson.common.items.
+    Backend-specific wrapper for enumjson.common.items_per_document. `config`
+    are the parser options of basic_parse.
     '''
-    return common.items(parse(file), prefix)
+    offsets = common.DocumentOffsets()
+    return common.items_per_document(basic_parse(file, offsets=offsets, **config), offsets,
+                                     prefix, as_objects=as_objects, number=number)
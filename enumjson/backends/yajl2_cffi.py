@@ -7,7 +7,7 @@ import functools
 import sys
 
 from enumjson import common, backends
-from enumjson.compat import b2s
+from enumjson.compat import b2s, b2s_replace
 
 
 ffi = FFI()
@@ -58,6 +58,7 @@ yajl_status yajl_parse(yajl_handle hand, const unsigned char *jsonText, size_t j
 yajl_status yajl_complete_parse(yajl_handle hand);
 unsigned char* yajl_get_error(yajl_handle hand, int verbose, const unsigned char *jsonText, size_t jsonTextLength);
 void yajl_free_error(yajl_handle hand, unsigned char * str);
+size_t yajl_get_bytes_consumed(yajl_handle hand);
 void yajl_free(yajl_handle handle);
 """)
 
@@ -73,126 +74,185 @@ YAJL_ERROR = 3
 YAJL_ALLOW_COMMENTS = 1
 YAJL_MULTIPLE_VALUES = 8
 
+# the variadic argument of yajl_config turning an option on
+_ENABLE = ffi.cast('int', 1)
+
+
+Events = backends.Events
+
 
 def append_event_to_ctx(event):
+    depth = backends.DEPTH_CHANGE.get(event, 0)
     def wrapper(func):
         @functools.wraps(func)
         def wrapped(ctx, *args, **kwargs):
-            value = func(*args, **kwargs)
             ctx = ffi.from_handle(ctx)
+            if ctx.skipping:
+                ctx.skipping += depth
+                if not ctx.skipping:
+                    ctx.append((event, None))
+                return 1
+            value = func(*args, **kwargs)
             ctx.append((event, value))
             return 1
         return wrapped
     return wrapper
 
 
-@ffi.callback('int(void *ctx)')
-@append_event_to_ctx('null')
-def null():
-    return None
-
-
-@ffi.callback('int(void *ctx, int val)')
-@append_event_to_ctx('boolean')
-def boolean(val):
-    return bool(val)
-
-
-@ffi.callback('int(void *ctx, long long integerVal)')
-@append_event_to_ctx('integer')
-def integer(val):
-    return int(val)
-
-
-@ffi.callback('int(void *ctx, double doubleVal)')
-@append_event_to_ctx('double')
-def double(val):
-    return float(val)
-
-
-@ffi.callback('int(void *ctx, const char *numberVal, size_t numberLen)')
-@append_event_to_ctx('number')
-def number(val, length):
-    return common.number(b2s(ffi.string(val, maxlen=length)))
-
-
-@ffi.callback('int(void *ctx, const unsigned char *stringVal, size_t stringLen)')
-@append_event_to_ctx('string')
-def string(val, length):
-    return ffi.string(val, maxlen=length).decode('utf-8')
-
-
-@ffi.callback('int(void *ctx)')
-@append_event_to_ctx('start_map')
-def start_map():
-    return None
-
-
-@ffi.callback('int(void *ctx, const unsigned char *key, size_t stringLen)')
-@append_event_to_ctx('map_key')
-def map_key(key, length):
-    return b2s(ffi.string(key, maxlen=length))
-
-
-@ffi.callback('int(void *ctx)')
-@append_event_to_ctx('end_map')
-def end_map():
-    return None
-
-
-@ffi.callback('int(void *ctx)')
-@append_event_to_ctx('start_array')
-def start_array():
-    return None
-
-
-@ffi.callback('int(void *ctx)')
-@append_event_to_ctx('end_array')
-def end_array():
-    return None
-
+def callbacks(codes):
+    '''
+    Returns the callbacks of the parsers yielding event names, or the
+    integer codes of enumjson.common with `codes`, so that the event type
+    appended by every callback is bound once.
+    '''
+    def event(name):
+        return common.EVENT_CODES.get(name, name) if codes else name
+
+    number_event = event('number')
+
+    @ffi.callback('int(void *ctx)')
+    @append_event_to_ctx(event('null'))
+    def null():
+        return 'null'
+
+    @ffi.callback('int(void *ctx, int val)')
+    @append_event_to_ctx(event('boolean'))
+    def boolean(val):
+        return 'true' if val else 'false'
+
+    @ffi.callback('int(void *ctx, long long integerVal)')
+    @append_event_to_ctx(event('integer'))
+    def integer(val):
+        return int(val)
+
+    @ffi.callback('int(void *ctx, double doubleVal)')
+    @append_event_to_ctx(event('double'))
+    def double(val):
+        return float(val)
+
+    @ffi.callback('int(void *ctx, const char *numberVal, size_t numberLen)')
+    def number(ctx, val, length):
+        # the conversion is chosen per parser, so the context is needed here;
+        # numbers don't change the depth of a skipped container
+        ctx = ffi.from_handle(ctx)
+        if not ctx.skipping:
+            value = b2s(ffi.string(val, maxlen=length))
+            if ctx.number is not None:
+                value = ctx.number(value)
+            ctx.append((number_event, value))
+        return 1
+
+    @ffi.callback('int(void *ctx, const unsigned char *stringVal, size_t stringLen)')
+    @append_event_to_ctx(event('string'))
+    def string(val, length):
+        return ffi.string(val, maxlen=length).decode('utf-8', 'replace')
+
+    @ffi.callback('int(void *ctx)')
+    @append_event_to_ctx(event('start_map'))
+    def start_map():
+        return None
+
+    @ffi.callback('int(void *ctx, const unsigned char *key, size_t stringLen)')
+    @append_event_to_ctx(event('map_key'))
+    def map_key(key, length):
+        return b2s_replace(ffi.string(key, maxlen=length))
+
+    @ffi.callback('int(void *ctx)')
+    @append_event_to_ctx(event('end_map'))
+    def end_map():
+        return None
+
+    @ffi.callback('int(void *ctx)')
+    @append_event_to_ctx(event('start_array'))
+    def start_array():
+        return None
+
+    @ffi.callback('int(void *ctx)')
+    @append_event_to_ctx(event('end_array'))
+    def end_array():
+        return None
 
-_callback_data = (
     # For more information about callbacks,
     # take a look at the ctypes backend
-    null, boolean, integer, double, number, string,
-    start_map, map_key, end_map, start_array, end_array
-)
+    return (
+        null, boolean, integer, double, number, string,
+        start_map, map_key, end_map, start_array, end_array
+    )
 
 
-_asd = list()
-def yajl_init(scope, events, allow_comments=False, multiple_values=False):
-    scope.ctx = ffi.new_handle(events)
-    scope.callbacks = ffi.new('yajl_callbacks*', _callback_data)
-    handle = yajl.yajl_alloc(scope.callbacks, ffi.NULL, scope.ctx)
+# Built once and shared by all parsers. The structs don't keep the
+# callbacks alive, so their tuples are kept along with them.
+_callback_data = callbacks(False)
+_code_callback_data = callbacks(True)
+_callbacks = ffi.new('yajl_callbacks*', _callback_data)
+_code_callbacks = ffi.new('yajl_callbacks*', _code_callback_data)
+
+
+def yajl_init(ctx, codes=False, **config):
+    '''
+    Allocates a parser handle calling back with `ctx`, the cffi handle of
+    the Events list to fill, with event codes if `codes` is set. `config`
+    are the options of enumjson.backends.yajl2_options.
+    '''
+    return yajl_alloc_handle(ctx, codes, backends.yajl2_options(**config))
 
-    if allow_comments:
-        yajl.yajl_config(handle, YAJL_ALLOW_COMMENTS, ffi.cast('int', 1))
-    if multiple_values:
-        yajl.yajl_config(handle, YAJL_MULTIPLE_VALUES, ffi.cast('int', 1))
 
+def yajl_alloc_handle(ctx, codes, options):
+    '''
+    Allocates a parser handle like yajl_init, `options` being the
+    yajl_option flags returned by enumjson.backends.yajl2_options.
+    '''
+    table = _code_callbacks if codes else _callbacks
+    handle = yajl.yajl_alloc(table, ffi.NULL, ctx)
+    for option in options:
+        yajl.yajl_config(handle, option, _ENABLE)
     return handle
 
 
-def yajl_parse(handle, buffer):
-    if buffer:
-        result = yajl.yajl_parse(handle, buffer, len(buffer))
+def yajl_parse(handle, buffer, start=0):
+    '''
+    Parses `buffer` from `start` on, completing the parse if there is
+    nothing left. Returns the number of bytes consumed.
+    '''
+    length = len(buffer) - start
+    if start or not isinstance(buffer, bytes):
+        # views of a MappedFile are passed to yajl without copying
+        buffer = ffi.from_buffer(buffer) + start
+    if length:
+        result = yajl.yajl_parse(handle, buffer, length)
     else:
         result = yajl.yajl_complete_parse(handle)
 
     if result != YAJL_OK:
-        perror = yajl.yajl_get_error(handle, 1, buffer, len(buffer))
-        error = b2s(ffi.string(perror))
+        perror = yajl.yajl_get_error(handle, 1, buffer, length)
+        error = ffi.string(perror).decode('utf-8', 'replace')
         yajl.yajl_free_error(handle, perror)
         exception = common.IncompleteJSONError if result == YAJL_INSUFFICIENT_DATA else common.JSONError
         raise exception(error)
+    return yajl.yajl_get_bytes_consumed(handle)
+
+
+class Parser(backends.YajlParser):
+    '''
+    Reusable parser, see enumjson.backends.YajlParser. Takes the
+    `codes` and `number` options of basic_parse and the yajl options of
+    enumjson.backends.yajl2_options.
+    '''
+    def _context(self, events):
+        return ffi.new_handle(events)
 
+    def _alloc(self):
+        return yajl_alloc_handle(self.context, self.codes, self.options)
 
-class Container(object):
-    pass
+    def _parse(self, buffer, start=0):
+        return yajl_parse(self.handle, buffer, start)
+
+    def _free(self, handle):
+        yajl.yajl_free(handle)
 
 
-def basic_parse(f, buf_size=64*1024, **config):
+def basic_parse(f, buf_size=64*1024, skipper=None, codes=False, number=None, offsets=None,
+                **config):
     '''
     Iterator yielding unprefixed events.
 
@@ -202,42 +262,92 @@ def basic_parse(f, buf_size=64*1024, **config):
     - allow_comments: tells parser to allow comments in JSON input
     - buf_size: a size of an input buffer
     - multiple_values: allows the parser to parse multiple JSON objects
+    - skipper: an enumjson.common.Skipper through which the consumer can
+      skip containers
+    - codes: if True, event types are the integer codes of enumjson.common
+    - number: a callable converting number lexemes, such as
+      enumjson.common.number or decimal.Decimal; they are yielded as text
+      by default
+    - offsets: an enumjson.common.DocumentOffsets receiving the byte offset
+      of each value of a stream of concatenated JSON values, such as JSON
+      Lines, which are then parsed one at a time with a yajl handle each;
+      on small documents this is about 1.5 times as slow as
+      multiple_values, which is preferable when the offsets aren't needed
+    - trusted: fast mode for input known to be valid, strings aren't
+      validated and truncated input isn't an error; this and the other yajl
+      options are described in enumjson.backends.yajl2_options
+
+    Use a Parser to parse many documents with the same options.
     '''
+    return Parser(codes, number, **config).basic_parse(f, buf_size, skipper, offsets)
 
-    # the scope objects makes sure the C objects allocated in _yajl.init
-    # are kept alive until this function is done
-    scope = Container()
-    events = []
 
-    handle = yajl_init(scope, events, **config)
-    try:
-        while True:
-            buffer = f.read(buf_size)
-            # this calls the callbacks which will
-            # fill the events list
-            yajl_parse(handle, buffer)
+def basic_parse_batches(f, buf_size=64*1024, codes=False, number=None, **config):
+    '''
+    Iterator yielding lists of unprefixed events, one list per chunk of
+    input. Takes the same parameters as basic_parse except for `skipper`.
+    '''
+    return Parser(codes, number, **config).basic_parse_batches(f, buf_size)
 
-            if not buffer and not events:
-                break
 
-            for event in events:
-                yield event
+def parse(file, codes=False, **kwargs):
+    '''
+    Backend-specific wrapper for enumjson.common.parse.
+    '''
+    return common.parse(basic_parse(file, codes=codes, **kwargs), codes=codes)
 
-            # clear all events, but don't replace the
-            # the events list instance
-            del events[:]
-    finally:
-        yajl.yajl_free(handle)
+def parse_batches(file, codes=False, **kwargs):
+    '''
+    Backend-specific wrapper for enumjson.common.parse_batches.
+    '''
+    return common.parse_batches(basic_parse_batches(file, codes=codes, **kwargs),
+                                codes=codes)
+
+def items(file, prefix, as_objects=False, number=None, skip=False, **config):
+    '''
+    Backend-specific wrapper for enumjson.common.items. `config` are the
+    parser options of basic_parse, such as trusted.
+    '''
+    skipper = common.Skipper() if skip else None
+    return common.items(parse(file, skipper=skipper, **config), prefix,
+                        as_objects=as_objects, number=number, skipper=skipper)
 
 
-def parse(file, **kwargs):
+def multi_items(file, patterns, as_objects=False, number=None, skip=False, **config):
     '''
-    Backend-specific wrapper for enumjson.common.parse.
+    Backend-specific wrapper for enumjson.common.multi_items. `config` are
+    the parser options of basic_parse.
     '''
-    return common.parse(basic_parse(file, **kwargs))
+    skipper = common.Skipper() if skip else None
+    return common.multi_items(basic_parse(file, skipper=skipper, **config), patterns,
+                              as_objects=as_objects, number=number, skipper=skipper)
+
+
+def items_batches(file, prefix, as_objects=False, number=None, **config):
+    '''
+    Backend-specific wrapper for enumjson.common.items_batches. `config`
+    are the parser options of basic_parse_batches.
+    '''
+    return common.items_batches(parse_batches(file, **config), prefix,
+                                as_objects=as_objects, number=number)
+
+
+def iter_documents(file, as_objects=False, number=None, **config):
+    '''
+    Backend-specific wrapper for enumjson.common.iter_documents, over a file
+    of concatenated JSON values such as JSON Lines. `config` are the parser
+    options of basic_parse.
+    '''
+    offsets = common.DocumentOffsets()
+    return common.iter_documents(basic_parse(file, offsets=offsets, **config), offsets,
+                                 as_objects=as_objects, number=number)
+
 
-def items(file, prefix):
+def items_per_document(file, prefix, as_objects=False, number=None, **config):
     '''
-    Backend-specific wrapper for enumjson.common.items.
+    Backend-specific wrapper for enumjson.common.items_per_document. `config`
+    are the parser options of basic_parse.
     '''
-    return common.items(parse(file), prefix)
+    offsets = common.DocumentOffsets()
+    return common.items_per_document(basic_parse(file, offsets=offsets, **config), offsets,
+                                     prefix, as_objects=as_objects, number=number)
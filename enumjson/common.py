@@ -1,6 +1,61 @@
 '''
 Backend independent higher level interfaces, common exceptions.
 '''
+import mmap
+import numbers
+import os
+from collections import deque
+from json.encoder import encode_basestring
+
+
+# Compact event protocol: event types as small integer codes indexing
+# EVENT_NAMES. Backends emit them instead of the names with ``codes=True``.
+NULL, BOOLEAN, NUMBER, STRING, MAP_KEY, START_MAP, END_MAP, START_ARRAY, END_ARRAY = range(9)
+EVENT_NAMES = ('null', 'boolean', 'number', 'string', 'map_key',
+               'start_map', 'end_map', 'start_array', 'end_array')
+EVENT_CODES = dict((name, code) for code, name in enumerate(EVENT_NAMES))
+
+# Start events of containers, in both protocols, mapped to their end events.
+CONTAINER_ENDS = {
+    'start_map': 'end_map', 'start_array': 'end_array',
+    START_MAP: END_MAP, START_ARRAY: END_ARRAY,
+}
+
+# Scalar events, in both protocols. The prefix computations check them first
+# with a single lookup since they make up most of the events.
+SCALAR_EVENTS = frozenset(EVENT_NAMES[:MAP_KEY] + tuple(range(MAP_KEY)))
+
+# Change of the nesting depth after container events, in both protocols.
+DEPTH_CHANGE = {'start_map': 1, 'start_array': 1, 'end_map': -1, 'end_array': -1}
+DEPTH_CHANGE.update((EVENT_CODES[name], change) for name, change in list(DEPTH_CHANGE.items()))
+
+
+def event_codes(basic_events):
+    '''
+    Converts unprefixed events with event names to the compact protocol.
+    '''
+    for event, value in basic_events:
+        yield EVENT_CODES[event], value
+
+
+def event_names(basic_events):
+    '''
+    Converts unprefixed events of the compact protocol to event names.
+    '''
+    for event, value in basic_events:
+        yield EVENT_NAMES[event], value
+
+
+def event_table(**handlers):
+    '''
+    Returns a dispatch table mapping both the names and the codes of events
+    to the handlers given by event name.
+    '''
+    table = dict(handlers)
+    for name, handler in handlers.items():
+        table[EVENT_CODES[name]] = handler
+    return table
+
 
 class JSONError(Exception):
     '''
@@ -16,7 +71,81 @@ class IncompleteJSONError(JSONError):
     pass
 
 
-def parse(basic_events):
+class Skipper(object):
+    '''
+    Lets the consumer of events ask a backend to skip a container. Setting
+    `skip` right after receiving a ``start_map`` or ``start_array`` event
+    makes the backend jump over the container content without producing
+    its events, and yield the matching end event next.
+
+    A skipper is passed to the backend ``basic_parse`` and to the consumer,
+    such as ``items``.
+    '''
+    __slots__ = ('skip',)
+
+    def __init__(self):
+        self.skip = False
+
+
+class DocumentOffsets(deque):
+    '''
+    Byte offsets where the documents of a stream of concatenated JSON values
+    start, such as the lines of JSON Lines. A backend parsing such a stream
+    with ``offsets`` appends the offset of every document before yielding
+    its first event, and ``iter_documents`` or ``items_per_document`` takes
+    them in turn as documents begin.
+    '''
+    __slots__ = ()
+
+
+class MappedFile(object):
+    '''
+    Read-only file-like object over a memory mapped file. `read` returns
+    memoryview slices of the mapping, so backends get the data straight from
+    the page cache instead of copies made by ``file.read``. Views handed out
+    by `read` must not outlive the object, which is closed by `close` or on
+    leaving a ``with`` block.
+    '''
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size:
+                # The mapping is never written to: copy-on-write access is
+                # used because, unlike read-only access, it exposes a
+                # writable buffer which ctypes can point to without copying.
+                self.mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+                self.view = memoryview(self.mapping)
+            else:
+                self.mapping = None
+                self.view = memoryview(b'')
+        self.pos = 0
+
+    def read(self, size=-1):
+        start = self.pos
+        if size < 0:
+            self.pos = len(self.view)
+        else:
+            self.pos = min(start + size, len(self.view))
+        return self.view[start:self.pos]
+
+    def close(self):
+        try:
+            self.view.release()
+            if self.mapping is not None:
+                self.mapping.close()
+        except BufferError:
+            # A backend still points into the mapping, from the frames of
+            # the traceback of a parse error for instance: the mapping is
+            # unmapped once those references are collected.
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def parse(basic_events, prefix_type='string', codes=False):
     '''
     An iterator returning parsing events with the information about their location
     with the JSON object tree. Events are tuples ``(prefix, type, value)``.
@@ -58,104 +187,607 @@ def parse(basic_events):
       ('map', 'end_map', None)
       ('', 'end_map', None)
 
+    With ``prefix_type='tuple'`` prefixes are tuples of path segments, like
+    ``('map', 'key')``, and with ``prefix_type='depth'`` they are just the
+    number of segments in the path.
+
+    Prefixes are cached per nesting level and only recomputed when the path
+    changes, that is on map keys and on entering or leaving a container.
+
+    With ``codes=True`` the events are expected in the compact protocol,
+    with integer codes as types, and are passed on as such.
     '''
-    path = []
+    names = range(len(EVENT_NAMES)) if codes else EVENT_NAMES
+    if prefix_type == 'string':
+        return _parse_string(basic_events, names)
+    elif prefix_type == 'tuple':
+        return _parse_tuple(basic_events, names)
+    elif prefix_type == 'depth':
+        return _parse_depth(basic_events, names)
+    raise ValueError('Unknown prefix type %r' % (prefix_type,))
+
+
+def _parse_string(basic_events, names):
+    map_key, start_map, end_map, start_array, end_array = names[MAP_KEY:]
+    scalars = SCALAR_EVENTS
+    prefixes = ['']
     for event, value in basic_events:
-        if event == 'map_key':
-            prefix = '.'.join(path[:-1])
-            path[-1] = value
-        elif event == 'start_map':
-            prefix = '.'.join(path)
-            path.append(None)
-        elif event == 'end_map':
-            path.pop()
-            prefix = '.'.join(path)
-        elif event == 'start_array':
-            prefix = '.'.join(path)
-            path.append('item')
-        elif event == 'end_array':
-            path.pop()
-            prefix = '.'.join(path)
-        else: # any scalar value
-            prefix = '.'.join(path)
+        if event in scalars:
+            prefix = prefixes[-1]
+        elif event == map_key:
+            prefix = prefixes[-2]
+            prefixes[-1] = prefix + '.' + value if len(prefixes) > 2 else value
+        elif event == start_map:
+            prefix = prefixes[-1]
+            prefixes.append(None)
+        elif event == end_map or event == end_array:
+            prefixes.pop()
+            prefix = prefixes[-1]
+        else: # start_array
+            prefix = prefixes[-1]
+            prefixes.append(prefix + '.item' if len(prefixes) > 1 else 'item')
 
         yield prefix, event, value
 
+
+def _parse_tuple(basic_events, names):
+    map_key, start_map, end_map, start_array, end_array = names[MAP_KEY:]
+    scalars = SCALAR_EVENTS
+    prefixes = [()]
+    for event, value in basic_events:
+        if event in scalars:
+            prefix = prefixes[-1]
+        elif event == map_key:
+            prefix = prefixes[-2]
+            prefixes[-1] = prefix + (value,)
+        elif event == start_map:
+            prefix = prefixes[-1]
+            prefixes.append(None)
+        elif event == end_map or event == end_array:
+            prefixes.pop()
+            prefix = prefixes[-1]
+        else: # start_array
+            prefix = prefixes[-1]
+            prefixes.append(prefix + ('item',))
+
+        yield prefix, event, value
+
+
+def _parse_depth(basic_events, names):
+    map_key, start_map, end_map, start_array, end_array = names[MAP_KEY:]
+    scalars = SCALAR_EVENTS
+    depth = 0
+    for event, value in basic_events:
+        if event in scalars:
+            yield depth, event, value
+        elif event == map_key:
+            yield depth - 1, event, value
+        elif event == start_map or event == start_array:
+            yield depth, event, value
+            depth += 1
+        else: # end_map or end_array
+            depth -= 1
+            yield depth, event, value
+
+
+def parse_batches(basic_batches, codes=False):
+    '''
+    Batch version of ``parse``: an iterator over lists of unprefixed events,
+    as produced by ``basic_parse_batches`` of the yajl backends, yielding a
+    list of ``(prefix, type, value)`` events for each of them.
+    '''
+    prefix_batch = batch_prefixer(codes)
+    for batch in basic_batches:
+        yield prefix_batch(batch)
+
+
+def batch_prefixer(codes=False):
+    '''
+    Push-style ``parse_batches``: returns a function taking each list of
+    unprefixed events in turn and returning the list of prefixed events.
+    '''
+    names = range(len(EVENT_NAMES)) if codes else EVENT_NAMES
+    map_key, start_map, end_map, start_array, end_array = names[MAP_KEY:]
+    scalars = SCALAR_EVENTS
+    prefixes = ['']
+
+    def prefix_batch(batch):
+        prefixed = []
+        append = prefixed.append
+        for event, value in batch:
+            if event in scalars:
+                prefix = prefixes[-1]
+            elif event == map_key:
+                prefix = prefixes[-2]
+                prefixes[-1] = prefix + '.' + value if len(prefixes) > 2 else value
+            elif event == start_map:
+                prefix = prefixes[-1]
+                prefixes.append(None)
+            elif event == end_map or event == end_array:
+                prefixes.pop()
+                prefix = prefixes[-1]
+            else: # start_array
+                prefix = prefixes[-1]
+                prefixes.append(prefix + '.item' if len(prefixes) > 1 else 'item')
+            append((prefix, event, value))
+        return prefixed
+
+    return prefix_batch
+
+
 class TextBuilder(object):
     '''
     Incrementally builds an object from JSON parser events. Events are passed
     into the `event` function that accepts two parameters: event type and
     value. The object being built is available at any time from the `value`
     attribute.
+
+    Text is accumulated as a list of chunks which is joined only when
+    `value` is read, and strings are escaped with the json module encoder.
+    Event types may be given as names or as codes of the compact protocol,
+    and values of null, boolean and number events as text or converted.
     '''
+    __slots__ = ('chunks', 'stack')
+
     def __init__(self):
-        self.value = ''
-        self.stack = list([['', 0],])
+        self.chunks = []
+        self.stack = [['', False]]
+
+    @property
+    def value(self):
+        text = ''.join(self.chunks)
+        self.chunks[:] = [text]
+        return text
+
+    def _start_map(self, value):
+        self._separate('array')
+        self.chunks.append('{')
+        self.stack.append(['map', False])
+
+    def _start_array(self, value):
+        self._separate('array')
+        self.chunks.append('[')
+        self.stack.append(['array', False])
+
+    def _end_array(self, value):
+        self.chunks.append(']')
+        self.stack.pop()
+
+    def _end_map(self, value):
+        self.chunks.append('}')
+        self.stack.pop()
+
+    def _map_key(self, value):
+        self._separate('map')
+        self.chunks.append(encode_basestring(value))
+        self.chunks.append(': ')
+
+    def _string(self, value):
+        self._separate('array')
+        self.chunks.append(encode_basestring(value))
+
+    def _null(self, value):
+        self._separate('array')
+        self.chunks.append('null')
+
+    def _boolean(self, value):
+        self._separate('array')
+        self.chunks.append('true' if value is True or value == 'true' else 'false')
+
+    def _number(self, value):
+        self._separate('array')
+        self.chunks.append(str(value) if isinstance(value, numbers.Number) else value)
+
+    _handlers = event_table(
+        null=_null, boolean=_boolean, number=_number, string=_string,
+        map_key=_map_key, start_map=_start_map, end_map=_end_map,
+        start_array=_start_array, end_array=_end_array)
 
     def event(self, event, value):
-        if event == 'start_map':
-            self.__insert_array_separator_if_required()
-            self.value += '{'
-            self.stack.append(['map', 0])
-        elif event == 'start_array':
-            self.__insert_array_separator_if_required()
-            self.value += '['
-            self.stack.append(['array', 0])
-        elif event == 'end_array':
-            self.value += ']'
-            self.stack.pop()
-        elif event == 'end_map':
-            self.value += '}'
-            self.stack.pop()
-        elif event == 'map_key':
-            self.__insert_map_separator_if_required()
-            value = '"{}": '.format(value)
-            self.value += value
-        elif event == 'string':
-            self.__insert_array_separator_if_required()
-            value = '"{}"'.format(value)
-            self.value += value
-        else:
-            self.__insert_array_separator_if_required()
-            self.value += value
-        
-    def __insert_array_separator_if_required(self):
-        current = self.stack[-1]
-        if current[0] == 'array':
-            if current[1] == 0:
-                current[1] += 1
-            else:
-                self.value += ', '
+        self._handlers[event](self, value)
 
-    def __insert_map_separator_if_required(self):
+    def _separate(self, kind):
         current = self.stack[-1]
-        if current[0] == 'map':
-            if current[1] == 0:
-                current[1] += 1
+        if current[0] == kind:
+            if current[1]:
+                self.chunks.append(', ')
             else:
-                self.value += ', '
-    
+                current[1] = True
+
+
+def number(symbol):
+    '''
+    Default number conversion: integer lexemes become ``int``, the ones with
+    a fraction or an exponent ``float``. Backends take it, or any other
+    callable such as ``decimal.Decimal``, as their `number` option, and
+    ObjectBuilder uses it for numbers still in text.
+    '''
+    if symbol.isdigit():
+        return int(symbol)
+    if '.' in symbol or 'e' in symbol or 'E' in symbol:
+        return float(symbol)
+    return int(symbol)
+
+
+# former name of number, which can't be used where `number` is an argument
+integer_or_float = number
+
+
+class ObjectBuilder(object):
+    '''
+    Incrementally builds native Python objects (dicts, lists, strings,
+    numbers, booleans and None) from JSON parser events. The interface is the
+    same as TextBuilder's.
+
+    Numbers arriving as text are converted with the `number` callable, for
+    example ``decimal.Decimal``, ``float`` or ``str`` to keep the raw lexeme.
+    It defaults to ``number``.
+    '''
+    __slots__ = ('value', 'key', 'containers', 'number')
+
+    def __init__(self, number=None):
+        def initial_set(value):
+            self.value = value
+        self.containers = [initial_set]
+        self.number = number or integer_or_float
+
+    def _map_key(self, value):
+        self.key = value
+
+    def _start_map(self, value):
+        mapping = {}
+        self.containers[-1](mapping)
+        def setter(value):
+            mapping[self.key] = value
+        self.containers.append(setter)
 
-def items(prefixed_events, prefix):
+    def _start_array(self, value):
+        array = []
+        self.containers[-1](array)
+        self.containers.append(array.append)
+
+    def _end(self, value):
+        self.containers.pop()
+
+    def _null(self, value):
+        self.containers[-1](None)
+
+    def _boolean(self, value):
+        self.containers[-1](value is True or value == 'true')
+
+    def _number(self, value):
+        if not isinstance(value, numbers.Number):
+            value = self.number(value)
+        self.containers[-1](value)
+
+    def _string(self, value):
+        self.containers[-1](value)
+
+    _handlers = event_table(
+        null=_null, boolean=_boolean, number=_number, string=_string,
+        map_key=_map_key, start_map=_start_map, end_map=_end,
+        start_array=_start_array, end_array=_end)
+
+    def event(self, event, value):
+        self._handlers[event](self, value)
+
+
+def items(prefixed_events, prefix, as_objects=False, number=None, skipper=None):
     '''
-    An iterator returning native Python objects constructed from the events
-    under a given prefix.
+    An iterator returning the items found under a given prefix.
+
+    By default maps and arrays are returned as JSON text built by TextBuilder
+    and scalars as their event values. With ``as_objects=True`` every item is
+    built by ObjectBuilder instead, using ``number`` to convert numbers.
+
+    If the Skipper of the backend producing the events is given, containers
+    that can't hold the prefix are skipped.
     '''
     prefixed_events = iter(prefixed_events)
     try:
         while True:
             current, event, value = next(prefixed_events)
             if current == prefix:
-                if event in ('start_map', 'start_array'):
-                    builder = TextBuilder()
-                    end_event = event.replace('start', 'end')
+                end_event = CONTAINER_ENDS.get(event)
+                if end_event is not None:
+                    builder = ObjectBuilder(number) if as_objects else TextBuilder()
                     while (current, event) != (prefix, end_event):
                         builder.event(event, value)
                         current, event, value = next(prefixed_events)
                     
+                    builder.event(event, value)
+                    yield builder.value
+                elif as_objects:
+                    builder = ObjectBuilder(number)
                     builder.event(event, value)
                     yield builder.value
                 else:
                     yield value
+            elif skipper is not None and current and event in CONTAINER_ENDS and \
+                    not prefix.startswith(current + '.'):
+                skipper.skip = True
     except StopIteration:
-        pass
\ No newline at end of file
+        pass
+
+
+def items_batches(prefixed_batches, prefix, as_objects=False, number=None):
+    '''
+    Batch version of ``items``: an iterator over lists of prefixed events,
+    as produced by ``parse_batches``, yielding the list of items completed
+    in each of them. Empty lists are not yielded.
+    '''
+    collect = item_collector(prefix, as_objects=as_objects, number=number)
+    for batch in prefixed_batches:
+        found = collect(batch)
+        if found:
+            yield found
+
+
+def item_collector(prefix, as_objects=False, number=None):
+    '''
+    Push-style ``items_batches``: returns a function taking each list of
+    prefixed events in turn and returning the list of items completed in it.
+    An item spanning several lists is returned with the list it ends in.
+    '''
+    # builder of the item in progress and the event ending it
+    state = [None, None]
+
+    def collect(batch):
+        builder, end_event = state
+        found = []
+        for current, event, value in batch:
+            if builder is not None:
+                builder.event(event, value)
+                if current == prefix and event == end_event:
+                    found.append(builder.value)
+                    builder = None
+            elif current == prefix:
+                if event in CONTAINER_ENDS:
+                    builder = ObjectBuilder(number) if as_objects else TextBuilder()
+                    builder.event(event, value)
+                    end_event = CONTAINER_ENDS[event]
+                elif as_objects:
+                    scalar = ObjectBuilder(number)
+                    scalar.event(event, value)
+                    found.append(scalar.value)
+                else:
+                    found.append(value)
+        state[:] = builder, end_event
+        return found
+
+    return collect
+
+
+class _PatternNode(object):
+    '''
+    Node of the pattern trie used by PrefixMatcher.
+    '''
+    __slots__ = ('children', 'star', 'globstar', 'loop', 'patterns')
+
+    def __init__(self, loop=False):
+        self.children = {}
+        self.star = None
+        self.globstar = None
+        self.loop = loop
+        self.patterns = []
+
+
+def _closure(nodes):
+    result = set()
+    pending = list(nodes)
+    while pending:
+        node = pending.pop()
+        if node not in result:
+            result.add(node)
+            if node.globstar is not None:
+                pending.append(node.globstar)
+    return frozenset(result)
+
+
+class _MatchState(object):
+    '''
+    State of the automaton compiled by PrefixMatcher: the set of trie nodes
+    matching the current path. Transitions are computed on first use and
+    cached, so only literal pattern segments get their own entries.
+    '''
+    __slots__ = ('matcher', 'nodes', 'accepts', 'literals', 'transitions', 'default')
+
+    def __init__(self, matcher, nodes):
+        self.matcher = matcher
+        self.nodes = nodes
+        # patterns in their order in the input, nodes being hashed by identity
+        self.accepts = tuple(pattern for index, pattern in
+                             sorted(entry for node in nodes for entry in node.patterns))
+        self.literals = set(key for node in nodes for key in node.children)
+        self.transitions = {}
+        self.default = None
+
+    def step(self, segment):
+        try:
+            return self.transitions[segment]
+        except KeyError:
+            pass
+        if segment in self.literals:
+            state = self.transitions[segment] = self._advance(segment)
+            return state
+        if self.default is None:
+            self.default = self._advance(None)
+        return self.default
+
+    def _advance(self, segment):
+        nodes = []
+        for node in self.nodes:
+            if segment in node.children:
+                nodes.append(node.children[segment])
+            if node.star is not None:
+                nodes.append(node.star)
+            if node.loop:
+                nodes.append(node)
+        return self.matcher.state(_closure(nodes))
+
+
+class PrefixMatcher(object):
+    '''
+    A set of prefix patterns compiled once into an automaton that is advanced
+    segment by segment as the parser enters and leaves containers.
+
+    Patterns use the same dotted notation as prefixes, with two wildcards:
+    ``*`` matches exactly one path segment and ``**`` matches any number of
+    segments, including none. For example ``docs.*.id`` or ``**.error``.
+    '''
+    def __init__(self, patterns):
+        self.states = {}
+        root = _PatternNode()
+        for index, pattern in enumerate(patterns):
+            node = root
+            for segment in pattern.split('.') if pattern else ():
+                if segment == '*':
+                    if node.star is None:
+                        node.star = _PatternNode()
+                    node = node.star
+                elif segment == '**':
+                    if node.globstar is None:
+                        node.globstar = _PatternNode(loop=True)
+                    node = node.globstar
+                else:
+                    node = node.children.setdefault(segment, _PatternNode())
+            node.patterns.append((index, pattern))
+        self.root = self.state(_closure([root]))
+
+    def state(self, nodes):
+        try:
+            return self.states[nodes]
+        except KeyError:
+            state = self.states[nodes] = _MatchState(self, nodes)
+            return state
+
+
+def multi_items(basic_events, patterns, as_objects=False, number=None, skipper=None,
+                codes=False):
+    '''
+    An iterator returning the items under any of several prefix patterns in
+    a single pass, as ``(pattern, prefix, item)`` tuples.
+
+    ``patterns`` is an iterable of patterns or a compiled PrefixMatcher, see
+    PrefixMatcher for the syntax. Unlike ``items`` this works on unprefixed
+    events and only builds prefix strings for the matched items. Items are
+    built as in ``items``. An item matching several patterns is built once
+    and yielded for each of them in the order of `patterns`, and an item
+    nested in another matched item is yielded before the item containing it.
+
+    If the Skipper of the backend producing the events is given, containers
+    that can't hold a match are skipped. ``codes=True`` tells that the events
+    use the compact protocol.
+    '''
+    names = range(len(EVENT_NAMES)) if codes else EVENT_NAMES
+    map_key, start_map, end_map, start_array, end_array = names[MAP_KEY:]
+    matcher = patterns if isinstance(patterns, PrefixMatcher) else PrefixMatcher(patterns)
+    path = []
+    states = [matcher.root]
+    active = []
+    for event, value in basic_events:
+        if event == map_key:
+            path[-1] = value
+            states[-1] = states[-2].step(value)
+            for builder, depth, accepts, prefix in active:
+                builder.event(event, value)
+        elif event == start_map or event == start_array:
+            accepts = states[-1].accepts
+            if accepts:
+                builder = ObjectBuilder(number) if as_objects else TextBuilder()
+                active.append((builder, len(path), accepts, '.'.join(path)))
+            elif skipper is not None and not active and not states[-1].nodes:
+                skipper.skip = True
+            for builder, depth, accepts, prefix in active:
+                builder.event(event, value)
+            if event == start_map:
+                path.append(None)
+                states.append(None)
+            else:
+                path.append('item')
+                states.append(states[-1].step('item'))
+        elif event == end_map or event == end_array:
+            path.pop()
+            states.pop()
+            for builder, depth, accepts, prefix in active:
+                builder.event(event, value)
+            if active and active[-1][1] == len(path):
+                builder, depth, accepts, prefix = active.pop()
+                item = builder.value
+                for pattern in accepts:
+                    yield pattern, prefix, item
+        else:
+            for builder, depth, accepts, prefix in active:
+                builder.event(event, value)
+            accepts = states[-1].accepts
+            if accepts:
+                if as_objects:
+                    builder = ObjectBuilder(number)
+                    builder.event(event, value)
+                    item = builder.value
+                else:
+                    item = value
+                prefix = '.'.join(path)
+                for pattern in accepts:
+                    yield pattern, prefix, item
+
+
+def _documents(basic_events, offsets, document):
+    '''
+    Passes unprefixed events through while keeping `document`, a list
+    ``[index, offset, depth]``, up to date with the index and the offset of
+    the document the last event belongs to and the depth following it.
+    '''
+    for event, value in basic_events:
+        if not document[2]:
+            document[0] += 1
+            document[1] = offsets.popleft()
+        document[2] += DEPTH_CHANGE.get(event, 0)
+        yield event, value
+
+
+def iter_documents(basic_events, offsets, as_objects=False, number=None):
+    '''
+    An iterator over the documents of a stream of concatenated JSON values,
+    such as JSON Lines, yielding an ``(index, offset, document)`` tuple for
+    each of them: its position in the stream, the byte offset where its text
+    starts and the document itself, built as ``items`` builds items.
+
+    The events and the DocumentOffsets filled along with them come from the
+    ``basic_parse`` of a backend given `offsets`. Either protocol of events
+    can be used.
+    '''
+    document = [-1, None, 0]
+    builder = None
+    for event, value in _documents(basic_events, offsets, document):
+        if builder is None and event not in CONTAINER_ENDS:
+            if as_objects:
+                scalar = ObjectBuilder(number)
+                scalar.event(event, value)
+                value = scalar.value
+            yield document[0], document[1], value
+            continue
+        if builder is None:
+            builder = ObjectBuilder(number) if as_objects else TextBuilder()
+        builder.event(event, value)
+        if not document[2]:
+            yield document[0], document[1], builder.value
+            builder = None
+
+
+def items_per_document(basic_events, offsets, prefix, as_objects=False, number=None,
+                       codes=False):
+    '''
+    ``items`` over a stream of concatenated JSON values, such as JSON Lines:
+    `prefix` is looked for in every document, starting from its root, and
+    the items are yielded as ``(index, offset, item)`` tuples along with the
+    index and the byte offset of the document holding them.
+
+    The events and the DocumentOffsets filled along with them come from the
+    ``basic_parse`` of a backend given `offsets`. ``codes=True`` tells that
+    the events use the compact protocol.
+    '''
+    document = [-1, None, 0]
+    events = parse(_documents(basic_events, offsets, document), codes=codes)
+    for item in items(events, prefix, as_objects=as_objects, number=number):
+        yield document[0], document[1], item
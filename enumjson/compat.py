@@ -10,7 +10,10 @@ IS_PY2 = sys.version_info[0] < 3
 
 if IS_PY2:
     b2s = lambda s: s
+    b2s_replace = b2s
     bytetype = str
 else:
     b2s = lambda b: b.decode('utf-8')
+    # for text that may not be valid UTF-8, which gets U+FFFD instead
+    b2s_replace = lambda b: b.decode('utf-8', 'replace')
     bytetype = bytes
@@ -0,0 +1,196 @@
+'''
+Sidecar offset indexes for random access into large JSON arrays.
+
+One pass over a file records the byte offset and length of every item under
+an array prefix, like ``docs.item``. The index is saved next to the file, and
+items are then read by their number, parsing only their own bytes::
+
+    index = enumjson.index.create_index('dump.json', 'docs.item')
+    ...
+    index = enumjson.index.load_index('dump.json.idx')
+    doc = enumjson.index.get_item('dump.json', index, 123456, as_objects=True)
+
+Offsets are those of the tokens of python.Lexer, which are byte offsets in
+the file. Containers held by the items are skipped as with ``skip=True``:
+they are only scanned for brackets and their content is not validated.
+
+The sidecar file holds a header followed by the offsets and the lengths as
+little-endian unsigned 64-bit integers.
+'''
+import os
+import struct
+import sys
+from array import array
+from io import BytesIO
+
+import enumjson
+from enumjson.backends import python
+
+
+SUFFIX = '.idx'
+MAGIC = b'EJIX'
+VERSION = 1
+# magic, version, size of the indexed file, number of items, length of the prefix
+HEADER = struct.Struct('<4sBQQH')
+TYPECODE = 'Q'
+
+
+class ItemIndex(object):
+    '''
+    Byte offsets and lengths of the items under `prefix` in a file of
+    `size` bytes, held in arrays. ``span(n)`` returns the ``(offset,
+    length)`` of item `n`.
+    '''
+    def __init__(self, prefix, size, offsets=None, lengths=None):
+        self.prefix = prefix
+        self.size = size
+        self.offsets = array(TYPECODE) if offsets is None else offsets
+        self.lengths = array(TYPECODE) if lengths is None else lengths
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def span(self, n):
+        return self.offsets[n], self.lengths[n]
+
+    def save(self, index_path):
+        prefix = self.prefix.encode('utf-8')
+        with open(index_path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, self.size, len(self), len(prefix)))
+            f.write(prefix)
+            for values in (self.offsets, self.lengths):
+                if sys.byteorder != 'little':
+                    values = array(TYPECODE, values)
+                    values.byteswap()
+                values.tofile(f)
+
+    @classmethod
+    def load(cls, index_path):
+        with open(index_path, 'rb') as f:
+            magic, version, size, count, length = HEADER.unpack(f.read(HEADER.size))
+            if magic != MAGIC or version != VERSION:
+                raise ValueError('%s is not an enumjson index' % (index_path,))
+            prefix = f.read(length).decode('utf-8')
+            offsets = array(TYPECODE)
+            lengths = array(TYPECODE)
+            offsets.fromfile(f, count)
+            lengths.fromfile(f, count)
+        if sys.byteorder != 'little':
+            offsets.byteswap()
+            lengths.byteswap()
+        return cls(prefix, size, offsets, lengths)
+
+
+def build_index(file, prefix, buf_size=python.BUFSIZE):
+    '''
+    Returns the ItemIndex of the items under `prefix` in `file`, a readable
+    file-like object. The prefix must address array items, like
+    ``docs.item``.
+    '''
+    segments = prefix.split('.')
+    if segments[-1] != 'item':
+        raise ValueError('Prefix %r does not address array items' % prefix)
+    container = segments[:-1]
+    lexer = python.Lexer(file, buf_size)
+    tokens = iter(lexer)
+    index = ItemIndex(prefix, 0)
+    path = []
+    key = None
+    for pos, symbol in tokens:
+        if symbol == b'[':
+            if path == container:
+                _index_items(tokens, index)
+            else:
+                path.append('item')
+        elif symbol == b'{':
+            path.append(None)
+        elif symbol == b']' or symbol == b'}':
+            path.pop()
+        elif symbol == b':':
+            path[-1] = python.parse_string(key)
+        elif symbol[0] == python.QUOTE:
+            key = symbol
+    index.size = lexer.bytes_read()
+    return index
+
+
+def _index_items(tokens, index):
+    '''
+    Records the items of the array whose opening bracket `tokens` has just
+    yielded, up to its closing bracket.
+    '''
+    for start, symbol in tokens:
+        if symbol == b']':
+            return
+        pos = start
+        if symbol == b'[' or symbol == b'{':
+            pos, symbol = tokens.send(python.SKIP)
+        index.offsets.append(start)
+        index.lengths.append(pos + len(symbol) - start)
+        pos, symbol = next(tokens)
+        if symbol == b']':
+            return
+        if symbol != b',':
+            raise python.UnexpectedSymbol(symbol, pos)
+    raise enumjson.IncompleteJSONError('Incomplete JSON data')
+
+
+def create_index(path, prefix, index_path=None):
+    '''
+    Builds the index of the items under `prefix` in the file at `path` and
+    saves it to `index_path`, ``path + SUFFIX`` by default. Returns the
+    ItemIndex.
+    '''
+    with open(path, 'rb') as f:
+        index = build_index(f, prefix)
+    index.save(index_path or path + SUFFIX)
+    return index
+
+
+def load_index(index_path):
+    '''
+    Loads an ItemIndex saved by ``create_index``.
+    '''
+    return ItemIndex.load(index_path)
+
+
+def _read(path, index, start, end):
+    if os.path.getsize(path) != index.size:
+        raise ValueError('The index of %s is out of date' % (path,))
+    with open(path, 'rb') as f:
+        f.seek(start)
+        return f.read(end - start)
+
+
+def get_item(path, index, n, **kwargs):
+    '''
+    Returns item `n` of `index` from the file at `path`, parsing only its
+    bytes. The keyword arguments are those of ``enumjson.items``, such as
+    ``as_objects``.
+    '''
+    offset, length = index.span(n)
+    data = _read(path, index, offset, offset + length)
+    return next(enumjson.items(BytesIO(data), '', **kwargs))
+
+
+def get_items(path, index, start=0, stop=None, **kwargs):
+    '''
+    Returns the list of the items of `index` from `start` to `stop`,
+    excluded, like a slice. They are read from the file at `path` with a
+    single read when they are next to each other in a same array. The
+    keyword arguments are those of ``enumjson.items``.
+    '''
+    start, stop, step = slice(start, stop).indices(len(index))
+    if start >= stop:
+        return []
+    first = index.offsets[start]
+    end = index.offsets[stop - 1] + index.lengths[stop - 1]
+    data = _read(path, index, first, end)
+    try:
+        items = list(enumjson.items(BytesIO(b'[' + data + b']'), 'item', **kwargs))
+    except enumjson.JSONError:
+        items = None
+    if items is None or len(items) != stop - start:
+        # the items span several arrays
+        items = [get_item(path, index, n, **kwargs) for n in range(start, stop)]
+    return items
@@ -0,0 +1,214 @@
+'''
+Extraction of array items in parallel processes, to be imported explicitly::
+
+    import enumjson.parallel
+
+    for doc in enumjson.parallel.parallel_items('dump.json', 'docs.item'):
+        ...
+
+A sequential pre-scan of a memory mapped file finds the arrays holding the
+items under a prefix and cuts them into byte ranges of whole items. The
+ranges are then parsed by the current backend in a pool of processes.
+
+JSON Lines files need no pre-scan: they are cut into ranges of whole lines
+at newlines, see ``items_lines``.
+'''
+import multiprocessing
+import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, as_completed, wait, FIRST_COMPLETED
+from io import BytesIO
+from json.decoder import scanstring
+
+import enumjson
+from enumjson.common import MappedFile, JSONError, IncompleteJSONError
+
+
+CHUNK_SIZE = 4 * 1024 * 1024
+
+# Strings as a whole, then the structural characters: groups tell them apart
+# without copying the matched bytes.
+STRUCTURE_RE = re.compile(br'("[^"\\]*(?:\\.[^"\\]*)*")|(\{)|(\[)|([\]}])|(,)|(:)', re.S)
+STRING, START_MAP, START_ARRAY, END, COMMA, COLON = range(1, 7)
+ITEMS_RE = re.compile(br'"[^"\\]*(?:\\.[^"\\]*)*"|([\[{])|([\]}])|(,)', re.S)
+START_ITEMS, END_ITEMS, COMMA_ITEMS = range(1, 4)
+NONBLANK_RE = re.compile(br'\S')
+NEWLINE_RE = re.compile(br'\n')
+
+
+def item_ranges(buffer, prefix, chunk_size=CHUNK_SIZE):
+    '''
+    Iterator over ``(start, end)`` byte ranges of `buffer` such that each
+    range holds whole items under `prefix`, separated by commas. The prefix
+    must address array items, like ``docs.item``. Ranges are cut at the
+    first item boundary past `chunk_size` bytes.
+
+    Only brackets, commas, colons and strings are looked at, the input is not
+    validated beyond raising JSONError on brackets that don't match.
+    '''
+    segments = prefix.split('.')
+    if segments[-1] != 'item':
+        raise ValueError('Prefix %r does not address array items' % prefix)
+    container = segments[:-1]
+    path = []
+    # closing brackets of the open containers
+    closing = []
+    key = None
+    pos = 0
+    while True:
+        for match in STRUCTURE_RE.finditer(buffer, pos):
+            kind = match.lastindex
+            if kind == STRING:
+                key = match
+            elif kind == COLON:
+                if not closing or closing[-1] != b'}' or key is None:
+                    raise _unexpected(match)
+                path[-1] = scanstring(key.group().decode('utf-8'), 1)[0]
+            elif kind == START_MAP:
+                path.append(None)
+                closing.append(b'}')
+            elif kind == START_ARRAY:
+                if path == container:
+                    break
+                path.append('item')
+                closing.append(b']')
+            elif kind == END:
+                if not closing or match.group() != closing.pop():
+                    raise _unexpected(match)
+                path.pop()
+        else:
+            if closing:
+                raise IncompleteJSONError('Incomplete JSON data')
+            return
+        # Inside an array of items only the nesting of brackets matters.
+        start = pos = match.end()
+        nested = []
+        for match in ITEMS_RE.finditer(buffer, pos):
+            kind = match.lastindex
+            if kind == START_ITEMS:
+                nested.append(b']' if match.group() == b'[' else b'}')
+            elif kind == END_ITEMS:
+                if not nested:
+                    if match.group() != b']':
+                        raise _unexpected(match)
+                    break
+                if match.group() != nested.pop():
+                    raise _unexpected(match)
+            elif kind == COMMA_ITEMS and not nested and match.start() - start >= chunk_size:
+                yield start, match.start()
+                start = match.end()
+        else:
+            raise IncompleteJSONError('Incomplete JSON data')
+        if NONBLANK_RE.search(buffer, start, match.start()):
+            yield start, match.start()
+        pos = match.end()
+
+
+def _unexpected(match):
+    return JSONError('Unexpected symbol %r at %d' % (match.group().decode('utf-8'), match.start()))
+
+
+def line_ranges(buffer, chunk_size=CHUNK_SIZE):
+    '''
+    Iterator over ``(start, end)`` byte ranges of `buffer` such that each
+    range holds whole lines. Ranges are cut at the first newline past
+    `chunk_size` bytes.
+    '''
+    start = 0
+    while start < len(buffer):
+        match = NEWLINE_RE.search(buffer, start + chunk_size)
+        end = match.end() if match else len(buffer)
+        yield start, end
+        start = end
+
+
+def _range_items(path, start, end, kwargs):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+    return list(enumjson.items(BytesIO(b'[' + data + b']'), 'item', **kwargs))
+
+
+def _line_items(path, start, end, prefix, kwargs):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+    documents = enumjson.items_per_document(BytesIO(data), prefix, **kwargs)
+    return [item for index, offset, item in documents]
+
+
+def pool_map(function, tasks, workers=None, ordered=True, window=None):
+    '''
+    Runs ``function(*task)`` for each of `tasks` in a pool of `workers`
+    processes and yields the results, in the order of the tasks or as they
+    complete. At most `window` tasks, twice the number of workers by
+    default, are in flight at a time, so tasks are only taken from the
+    iterable as fast as results are consumed.
+    '''
+    workers = workers or multiprocessing.cpu_count()
+    window = window or 2 * workers
+    with ProcessPoolExecutor(workers) as executor:
+        if ordered:
+            pending = deque()
+            for task in tasks:
+                if len(pending) >= window:
+                    yield pending.popleft().result()
+                pending.append(executor.submit(function, *task))
+            while pending:
+                yield pending.popleft().result()
+        else:
+            pending = set()
+            for task in tasks:
+                if len(pending) >= window:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield future.result()
+                pending.add(executor.submit(function, *task))
+            for future in as_completed(pending):
+                yield future.result()
+
+
+def parallel_items(path, prefix, workers=None, ordered=True, chunk_size=CHUNK_SIZE,
+                   **kwargs):
+    '''
+    An iterator returning the items under `prefix` in the file at `path`,
+    like ``enumjson.items``, but parsed by a pool of `workers` processes.
+    The prefix must address array items, like ``docs.item``. With
+    ``ordered=False`` items come in chunks as soon as they are parsed.
+
+    The remaining keyword arguments are passed to ``items`` of the current
+    backend in the workers.
+    '''
+    with MappedFile(path) as mapped:
+        ranges = item_ranges(mapped.view, prefix, chunk_size)
+        tasks = ((path, start, end, kwargs) for start, end in ranges)
+        try:
+            for chunk in pool_map(_range_items, tasks, workers, ordered):
+                for item in chunk:
+                    yield item
+        finally:
+            # release the scanner's view of the mapping before it is closed
+            ranges.close()
+
+
+def items_lines(path, prefix, workers=None, ordered=True, chunk_size=CHUNK_SIZE, **kwargs):
+    '''
+    An iterator returning the items under `prefix` in every line of the
+    JSON Lines file at `path`, like ``enumjson.items_per_document`` without
+    the document indexes and offsets, but parsed by a pool of `workers`
+    processes. The file is cut at newlines into ranges of about
+    `chunk_size` bytes, and with ``ordered=False`` the items of a range come
+    as soon as it is parsed.
+
+    The remaining keyword arguments are passed to ``items_per_document`` of
+    the current backend in the workers.
+    '''
+    with MappedFile(path) as mapped:
+        ranges = line_ranges(mapped.view, chunk_size)
+        tasks = ((path, start, end, prefix, kwargs) for start, end in ranges)
+        try:
+            for chunk in pool_map(_line_items, tasks, workers, ordered):
+                for item in chunk:
+                    yield item
+        finally:
+            ranges.close()
@@ -1,6 +1,8 @@
 # -*- coding:utf-8 -*-
 from functools import wraps
 
+from enumjson import common
+
 
 def coroutine(func):
     '''
@@ -15,6 +17,17 @@ def coroutine(func):
         return g
     return wrapper
 
+def _end_array(base, event, value):
+    '''
+    Returns the "end_array" event matching the "start_array" event that
+    foreach expects first, in the protocol of that event.
+    '''
+    if event == 'start_array':
+        return 'end_array'
+    if event == common.START_ARRAY:
+        return common.END_ARRAY
+    raise Exception('foreach requires "start_array" as the first event, got %s' % repr((base, event, value)))
+
 @coroutine
 def foreach(coroutine_func):
     '''
@@ -23,20 +36,107 @@ def foreach(coroutine_func):
     resulting coroutine should accept value in the form of tuple of values
     generated by rich JSON parser: (prefix, event, value).
 
-    First event received by foreach should be a "start_array" event.
+    First event received by foreach should be a "start_array" event, given
+    by name or by its code in the compact protocol. Items are told apart by
+    the nesting depth of the events in the array, so foreach must receive
+    all the events of the array.
     '''
+    end_array = _end_array(*(yield))
+    depth = 0
     g = None
-    base, event, value = yield
-    if event != 'start_array':
-        raise Exception('foreach requires "start_array" as the first event, got %s' % repr((base, event, value)))
-    START_EVENTS = set(['start_map', 'start_array', 'null', 'boolean', 'number', 'string'])
-    itemprefix = base + '.item' if base else 'item'
     while True:
         prefix, event, value = yield
-        if prefix == itemprefix and event in START_EVENTS:
+        if not depth:
+            if event == end_array:
+                continue
             g = coroutine_func()
-        if (prefix, event) != (base, 'end_array'):
-            g.send((prefix, event, value))
+        depth += common.DEPTH_CHANGE.get(event, 0)
+        g.send((prefix, event, value))
+
+@coroutine
+def foreach_batches(coroutine_func):
+    '''
+    Batch version of foreach: receives lists of events, the first of them
+    starting with the "start_array" event, and sends each item coroutine
+    the list of its events from each of them.
+    '''
+    end_array = None
+    depth = 0
+    g = None
+    while True:
+        events = []
+        for prefix, event, value in (yield):
+            if end_array is None:
+                end_array = _end_array(prefix, event, value)
+                continue
+            if not depth:
+                if event == end_array:
+                    continue
+                if events:
+                    g.send(events)
+                    events = []
+                g = coroutine_func()
+            depth += common.DEPTH_CHANGE.get(event, 0)
+            events.append((prefix, event, value))
+        if events:
+            g.send(events)
+
+
+class _RouteNode(object):
+    '''
+    Node of the trie of base prefixes used by Router, keyed on path
+    segments. `ends` holds the ``(segment, index, target)`` of the base
+    prefixes whose last segment follows the node.
+    '''
+    __slots__ = ('children', 'ends')
+
+    def __init__(self):
+        self.children = {}
+        self.ends = []
+
+
+class Router(object):
+    '''
+    The ``(base_prefix, target)`` tuples of a dispatcher compiled into a trie
+    keyed on path segments. ``route(prefix)`` returns the first target in
+    the list whose base prefix `prefix` starts with, as ``str.startswith``
+    tells, or None.
+
+    Routes are cached by prefix, so the events of a container are routed
+    with a single dictionary lookup. The cache is cleared once it holds
+    CACHE_SIZE prefixes, which only happens with maps of many keys.
+    '''
+    CACHE_SIZE = 4096
+
+    def __init__(self, targets):
+        self.root = _RouteNode()
+        for index, (base, target) in enumerate(targets):
+            segments = base.split('.')
+            node = self.root
+            for segment in segments[:-1]:
+                node = node.children.setdefault(segment, _RouteNode())
+            node.ends.append((segments[-1], index, target))
+        self.cache = {}
+
+    def route(self, prefix):
+        try:
+            return self.cache[prefix]
+        except KeyError:
+            pass
+        if len(self.cache) >= self.CACHE_SIZE:
+            self.cache.clear()
+        found = None
+        first = None
+        node = self.root
+        for segment in prefix.split('.'):
+            for last, index, target in node.ends:
+                if (first is None or index < first) and segment.startswith(last):
+                    first, found = index, target
+            node = node.children.get(segment)
+            if node is None:
+                break
+        self.cache[prefix] = found
+        return found
 
 @coroutine
 def dispatcher(targets):
@@ -45,11 +145,33 @@ def dispatcher(targets):
     prefixes.
 
     Accepts a list of tuples (base_prefix, coroutine). A coroutine then
-    receives all the events with prefixes starting with its base_prefix.
+    receives all the events with prefixes starting with its base_prefix,
+    the first matching one in the list taking the event. See Router.
     '''
+    route = Router(targets).route
     while True:
         prefix, event, value = yield
-        for base, target in targets:
-            if prefix.startswith(base):
-                target.send((prefix, event, value))
-                break
+        target = route(prefix)
+        if target is not None:
+            target.send((prefix, event, value))
+
+@coroutine
+def dispatcher_batches(targets):
+    '''
+    Batch version of dispatcher: receives lists of events, such as those of
+    enumjson.common.parse_batches, and sends each coroutine the list of the
+    events of every batch routed to it, if there are any.
+    '''
+    route = Router(targets).route
+    while True:
+        routed = {}
+        order = []
+        for event in (yield):
+            target = route(event[0])
+            if target is not None:
+                if target not in routed:
+                    routed[target] = []
+                    order.append(target)
+                routed[target].append(event)
+        for target in order:
+            target.send(routed[target])
@@ -0,0 +1,81 @@
+import asyncio
+import unittest
+from io import BytesIO, StringIO
+import enumjson
+import enumjson.asyncio
+from enumjson.common import parse, event_codes
+from test_backends_python import JSON, JSON_EVENTS, JSON_TAG_EVENTS
+
+
+class AsyncStream(object):
+    '''
+    Stand-in for an asyncio stream reader over in-memory bytes or text.
+    '''
+    def __init__(self, data):
+        self.f = BytesIO(data) if isinstance(data, bytes) else StringIO(data)
+
+    async def read(self, size=-1):
+        await asyncio.sleep(0)
+        return self.f.read(size)
+
+
+class TestAsyncio(unittest.TestCase):
+
+    def collect(self, events):
+        async def run():
+            return [event async for event in events]
+        # asyncio.run only comes with Python 3.7
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(run())
+        finally:
+            loop.close()
+
+    def test_basic_parse(self):
+        for buf_size in (1, 3, 7, len(JSON)):
+            events = self.collect(enumjson.asyncio.basic_parse(
+                AsyncStream(JSON), buf_size=buf_size, backend='python'))
+            self.assertEqual(events, JSON_EVENTS)
+
+    def test_parse_items(self):
+        prefixed = self.collect(enumjson.asyncio.parse(AsyncStream(JSON), buf_size=5,
+                                                       backend='python'))
+        self.assertEqual(prefixed, JSON_TAG_EVENTS)
+        meta = self.collect(enumjson.asyncio.items(AsyncStream(JSON), 'docs.item.meta',
+                                                   as_objects=True, buf_size=5, backend='python'))
+        self.assertEqual(meta, [[[1, 2], {}], {'key': 'value'}, None])
+
+    def test_codes(self):
+        for backend in (None, 'python'):
+            events = self.collect(enumjson.asyncio.basic_parse(AsyncStream(JSON), buf_size=5,
+                                                               backend=backend, codes=True))
+            self.assertEqual(events, list(event_codes(JSON_EVENTS)))
+            prefixed = self.collect(enumjson.asyncio.parse(AsyncStream(JSON), buf_size=5,
+                                                           backend=backend, codes=True))
+            self.assertEqual(prefixed, list(parse(iter(events), codes=True)))
+            self.assertEqual([prefix for prefix, _, _ in prefixed],
+                             [prefix for prefix, _, _ in JSON_TAG_EVENTS])
+            meta = self.collect(enumjson.asyncio.items(AsyncStream(JSON), 'docs.item.meta',
+                                                       as_objects=True, buf_size=5,
+                                                       backend=backend, codes=True))
+            self.assertEqual(meta, [[[1, 2], {}], {'key': 'value'}, None])
+
+    def test_text_and_options(self):
+        text = JSON.decode('utf-8')
+        for backend in (None, 'python'):
+            events = self.collect(enumjson.asyncio.basic_parse(AsyncStream(text), buf_size=7,
+                                                               backend=backend))
+            self.assertEqual(events, JSON_EVENTS)
+        with self.assertRaises(TypeError):
+            self.collect(enumjson.asyncio.basic_parse(AsyncStream(JSON), backend='python',
+                                                      allow_comments=True))
+
+    def test_incomplete(self):
+        for data in (b'[1, {"a": ', b'["abc', b'[1] 2'):
+            with self.assertRaises(enumjson.JSONError):
+                self.collect(enumjson.asyncio.basic_parse(AsyncStream(data), buf_size=2,
+                                                          backend='python'))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+import os
+import unittest
+from importlib import reload
+from io import BytesIO, StringIO
+import enumjson
+import enumjson.backends.python
+
+
+class TestBackendSelection(unittest.TestCase):
+
+    def tearDown(self):
+        os.environ.pop('ENUMJSON_BACKEND', None)
+        reload(enumjson)
+
+    def test_get_backend(self):
+        self.assertIs(enumjson.get_backend('python'), enumjson.backends.python)
+        self.assertIn(enumjson.backend_name, enumjson.BACKENDS)
+        self.assertIs(enumjson.backend, enumjson.get_backend(enumjson.backend_name))
+        self.assertTrue(enumjson._works(enumjson.backend))
+
+    def test_broken_backend(self):
+        class Broken(object):
+            @staticmethod
+            def basic_parse(f):
+                return list(enumjson.backends.python.basic_parse(f))[:-1]
+        self.assertFalse(enumjson._works(Broken))
+
+    def test_python_signature(self):
+        python = enumjson.backends.python
+        source = b'{"docs": [{"a": 1}, [2, "\xc3\xa9"]]}'
+        events = list(python.basic_parse(BytesIO(source)))
+        self.assertEqual(list(enumjson.basic_parse(BytesIO(source), 4)), events)
+        self.assertEqual(list(enumjson.basic_parse(StringIO(source.decode('utf-8')))), events)
+        self.assertEqual(list(enumjson.items(StringIO(source.decode('utf-8')), 'docs.item')),
+                         list(python.items(BytesIO(source), 'docs.item')))
+        self.assertEqual(list(enumjson.items(BytesIO(source), 'docs.item', raw=True)),
+                         ['{"a": 1}', u'[2, "\xe9"]'])
+        self.assertEqual(list(enumjson.items(BytesIO(source), 'docs.item', False, True)),
+                         [{'a': 1}, [2, u'\xe9']])
+
+    def test_python_ignores_yajl_options(self):
+        options = dict(trusted=True, allow_comments=True, dont_validate_strings=True,
+                       allow_trailing_garbage=True, allow_partial_values=True)
+        source = '[{"a": 1}]'
+        self.assertEqual(list(enumjson.items(StringIO(source), 'item', **options)),
+                         ['{"a": 1}'])
+        self.assertEqual(list(enumjson.items(BytesIO(source.encode()), 'item', raw=True,
+                                             **options)),
+                         ['{"a": 1}'])
+        os.environ['ENUMJSON_BACKEND'] = 'python'
+        reload(enumjson)
+        for f in (StringIO(source), BytesIO(source.encode())):
+            self.assertEqual(list(enumjson.basic_parse(f, **options)),
+                             list(enumjson.backends.python.basic_parse(StringIO(source))))
+        self.assertEqual(list(enumjson.items(BytesIO(source.encode()), 'item', as_objects=True,
+                                             trusted=True)),
+                         [{'a': 1}])
+        self.assertEqual(list(enumjson.iter_documents(BytesIO(b'1 2'), trusted=True)),
+                         [(0, 0, '1'), (1, 2, '2')])
+
+    def test_environment_override(self):
+        os.environ['ENUMJSON_BACKEND'] = 'python'
+        reload(enumjson)
+        self.assertEqual(enumjson.backend_name, 'python')
+        self.assertIs(enumjson.backend, enumjson.backends.python)
+
+
+if __name__ == "__main__":
+    unittest.main()
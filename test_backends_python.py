@@ -1,10 +1,17 @@
+import json
+import os
+import tempfile
 import unittest
+from decimal import Decimal
 from io import BytesIO, StringIO
-import enumjson.backends
+import enumjson
+import enumjson.backends.python
 from enumjson.common import parse
 from enumjson.common import items
+from enumjson.common import parse_batches, items_batches
+from enumjson.common import EVENT_NAMES, event_codes, event_names
 
-from enumjson.common import TextBuilder
+from enumjson.common import TextBuilder, number
 
 JSON = b'''
 {
@@ -146,15 +153,248 @@ class TestPythonBakend(unittest.TestCase):
             BytesIO(builder.value.encode('utf-8'))))
         self.assertEqual(events, JSON_EVENTS)
 
+    def test_deep_nesting(self):
+        depth = 5000
+        source = b'[' * depth + b'{"a": 1}' + b']' * depth
+        events = list(self.backend.basic_parse(BytesIO(source)))
+        self.assertEqual(len(events), 2 * depth + 4)
+        self.assertEqual(events[depth:depth + 4], [('start_map', None), ('map_key', 'a'),
+                                                   ('number', '1'), ('end_map', None)])
+
+    def test_lexer_buffer_boundaries(self):
+        source = b'["a\\\\", "b\\"\\\\\\"c", 12345.5e+10, true, {"k\\\\\\\\": null}]'
+        expected = list(self.backend.Lexer(BytesIO(source)))
+        for buf_size in range(1, 9):
+            self.assertEqual(list(self.backend.Lexer(BytesIO(source), buf_size)), expected)
+        events = list(self.backend.basic_parse(BytesIO(JSON), buf_size=3))
+        self.assertEqual(events, JSON_EVENTS)
+
+    def test_lexer_byte_offsets(self):
+        source = u'{"\xe9t\xe9": ["\u65e5", 1]}'
+        data = source.encode('utf-8')
+        tokens = list(self.backend.Lexer(BytesIO(data), 3))
+        self.assertEqual([pos for pos, lexeme in tokens], [0, 1, 8, 10, 11, 16, 18, 19, 20])
+        self.assertEqual([data[pos:pos + len(lexeme)] for pos, lexeme in tokens],
+                         [lexeme for pos, lexeme in tokens])
+        self.assertEqual(list(self.backend.Lexer(StringIO(source), 3)), tokens)
+
+    def test_incomplete_string(self):
+        with self.assertRaises(enumjson.IncompleteJSONError):
+            list(self.backend.basic_parse(BytesIO(b'["abc\\"'), buf_size=2))
+
     def test_parse(self):
         tags = list(parse(self.backend.basic_parse(BytesIO(JSON))))
         self.assertEqual(tags, JSON_TAG_EVENTS)
 
+    def test_parse_prefix_types(self):
+        events = list(self.backend.basic_parse(BytesIO(JSON)))
+        tuples = list(parse(events, prefix_type='tuple'))
+        self.assertEqual(
+            [('.'.join(prefix), event, value) for prefix, event, value in tuples],
+            JSON_TAG_EVENTS)
+        depths = list(parse(events, prefix_type='depth'))
+        self.assertEqual(
+            [(len(prefix), event, value) for prefix, event, value in tuples],
+            depths)
+
+    def test_parse_empty_keys(self):
+        events = self.backend.basic_parse(BytesIO(b'{"": {"": [1], "a": 2}}'))
+        self.assertEqual([prefix for prefix, event, value in parse(events)],
+                         ['', '', '', '', '.', '..item', '.', '', '.a', '', ''])
+
     def test_items(self):
         events = list(self.backend.basic_parse(BytesIO(JSON)))
         meta = list(items(parse(events), 'docs.item.meta'))
         self.assertEqual(meta, ['[[1, 2], {}]', '{"key": "value"}', 'null'])
 
+    def test_batches(self):
+        events = list(self.backend.basic_parse(BytesIO(JSON)))
+        for size in (1, 7, len(events)):
+            batches = [events[i:i + size] for i in range(0, len(events), size)]
+            prefixed = [event for batch in parse_batches(batches) for event in batch]
+            self.assertEqual(prefixed, JSON_TAG_EVENTS)
+            meta = [item for found in items_batches(parse_batches(batches), 'docs.item.meta')
+                    for item in found]
+            self.assertEqual(meta, ['[[1, 2], {}]', '{"key": "value"}', 'null'])
+
+    def test_numbers(self):
+        source = b'[0, -12, 0.5, 1.0e+2, 10000000000]'
+        values = [value for event, value in self.backend.basic_parse(BytesIO(source))
+                  if event == 'number']
+        self.assertEqual(values, ['0', '-12', '0.5', '1.0e+2', '10000000000'])
+        converted = [number(value) for value in values]
+        self.assertEqual(converted, [0, -12, 0.5, 100.0, 10000000000])
+        self.assertEqual([type(value) for value in converted], [int, int, float, float, int])
+        for convert in (number, Decimal):
+            events = list(self.backend.basic_parse(BytesIO(source), number=convert))
+            self.assertEqual([value for event, value in events if event == 'number'],
+                             [convert(value) for value in values])
+            builder = TextBuilder()
+            for event in events:
+                builder.event(*event)
+            self.assertEqual(json.loads(builder.value), converted)
+        for invalid in (b'[01]', b'[1.]', b'[-]', b'[nul]', b'[1e]'):
+            with self.assertRaises(enumjson.JSONError):
+                list(self.backend.basic_parse(BytesIO(invalid)))
+
+    def test_event_codes(self):
+        events = list(self.backend.basic_parse(BytesIO(JSON), codes=True))
+        self.assertEqual(events, list(event_codes(JSON_EVENTS)))
+        self.assertEqual(list(event_names(events)), JSON_EVENTS)
+        prefixed = list(self.backend.parse(BytesIO(JSON), codes=True))
+        self.assertEqual([(p, EVENT_NAMES[e], v) for p, e, v in prefixed], JSON_TAG_EVENTS)
+        meta = list(items(prefixed, 'docs.item.meta'))
+        self.assertEqual(meta, ['[[1, 2], {}]', '{"key": "value"}', 'null'])
+        meta = list(items(prefixed, 'docs.item.meta', as_objects=True))
+        self.assertEqual(meta, [[[1, 2], {}], {'key': 'value'}, None])
+
+    def test_push_parser(self):
+        for size in (1, 4, len(JSON)):
+            parser = self.backend.Parser()
+            events = []
+            for i in range(0, len(JSON), size):
+                parser.feed(JSON[i:i + size])
+                events.extend(parser.events())
+            parser.close()
+            events.extend(parser.events())
+            self.assertEqual(events, JSON_EVENTS)
+
+        parser = self.backend.Parser(codes=True)
+        parser.feed('{"a": [tr')
+        self.assertEqual(list(event_names(parser.events())),
+                         [('start_map', None), ('map_key', 'a'), ('start_array', None)])
+        parser.feed('ue')
+        self.assertEqual(parser.events(), [])
+        with self.assertRaises(enumjson.IncompleteJSONError):
+            parser.close()
+
+    def test_raw_items(self):
+        meta = list(self.backend.items(BytesIO(JSON), 'docs.item.meta', raw=True))
+        self.assertEqual(meta, ['[[1, 2], {}]', '{"key": "value"}', 'null'])
+
+    def test_raw_items_small_buffer(self):
+        docs = list(self.backend.items(BytesIO(JSON), 'docs.item', raw=True, buf_size=4))
+        self.assertEqual(docs[1], '{\n      "meta": [[1, 2], {}]\n    }')
+        self.assertEqual(docs[3], '{\n      "meta": null\n    }')
+
+    def test_items_as_objects(self):
+        meta = list(self.backend.items(BytesIO(JSON), 'docs.item.meta', as_objects=True))
+        self.assertEqual(meta, [[[1, 2], {}], {'key': 'value'}, None])
+
+        doc = next(self.backend.items(BytesIO(JSON), 'docs.item', as_objects=True,
+                                      number=Decimal))
+        self.assertEqual(doc, {
+            'null': None,
+            'boolean': False,
+            'true': True,
+            'integer': Decimal('0'),
+            'double': Decimal('0.5'),
+            'exponent': Decimal('1.0e+2'),
+            'long': Decimal('10000000000'),
+            'string': 'строка - тест',
+        })
+
+    def test_multi_items(self):
+        found = list(self.backend.multi_items(
+            BytesIO(JSON), ['docs.*.meta', '**.key', 'docs.item.integer', 'missing']))
+        self.assertEqual(found, [
+            ('docs.item.integer', 'docs.item.integer', '0'),
+            ('docs.*.meta', 'docs.item.meta', '[[1, 2], {}]'),
+            ('**.key', 'docs.item.meta.key', 'value'),
+            ('docs.*.meta', 'docs.item.meta', '{"key": "value"}'),
+            ('docs.*.meta', 'docs.item.meta', 'null'),
+        ])
+
+    def test_multi_items_nested(self):
+        found = list(self.backend.multi_items(
+            BytesIO(JSON), ['**', 'docs.item.meta.item'], as_objects=True))
+        self.assertEqual(found[:2], [
+            ('**', 'docs.item.null', None),
+            ('**', 'docs.item.boolean', False),
+        ])
+        self.assertIn(('docs.item.meta.item', 'docs.item.meta.item', [1, 2]), found)
+        self.assertEqual(found[-1][:2], ('**', ''))
+        self.assertEqual(found[-1][2]['docs'][2], {'meta': {'key': 'value'}})
+
+    def test_multi_items_pattern_order(self):
+        patterns = ['**.key', 'docs.*.meta.key', '*.item.*.key', 'docs.**', '**']
+        for order in (patterns, patterns[::-1], patterns[1::2] + patterns[::2]):
+            found = self.backend.multi_items(BytesIO(JSON), order)
+            found = [pattern for pattern, prefix, item in found if prefix == 'docs.item.meta.key']
+            self.assertEqual(found, order)
+
+    def test_skip(self):
+        source = b'[{"a": ["]", "\\\\", {"[": "\\"}"}], "b": 1}, 2]'
+        for buf_size in (1, 3, 1024):
+            skipper = enumjson.Skipper()
+            events = []
+            for event in self.backend.basic_parse(BytesIO(source), buf_size, skipper):
+                events.append(event)
+                if event == ('start_map', None):
+                    skipper.skip = True
+            self.assertEqual(events, [
+                ('start_array', None),
+                ('start_map', None),
+                ('end_map', None),
+                ('number', '2'),
+                ('end_array', None),
+            ])
+
+    def test_items_skip(self):
+        for prefix in ('docs.item.meta', 'docs.item.meta.item', 'docs.item.string'):
+            self.assertEqual(
+                list(self.backend.items(BytesIO(JSON), prefix, skip=True, buf_size=5)),
+                list(self.backend.items(BytesIO(JSON), prefix)))
+        patterns = ['docs.*.meta.key', 'docs.*.integer']
+        self.assertEqual(
+            list(self.backend.multi_items(BytesIO(JSON), patterns, skip=True)),
+            list(self.backend.multi_items(BytesIO(JSON), patterns)))
+
+    def test_text_builder_escaping(self):
+        source = b'{"a\\"b": ["quote \\" backslash \\\\ tab \\t", "\\u0001"]}'
+        builder = TextBuilder()
+        for item in self.backend.basic_parse(BytesIO(source)):
+            builder.event(*item)
+        events = list(self.backend.basic_parse(BytesIO(builder.value.encode('utf-8'))))
+        self.assertEqual(events, list(self.backend.basic_parse(BytesIO(source))))
+
+    def test_mapped_file(self):
+        with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as f:
+            f.write(JSON)
+        try:
+            with enumjson.MappedFile(f.name) as mapped:
+                events = list(self.backend.basic_parse(mapped, buf_size=16))
+            self.assertEqual(events, JSON_EVENTS)
+            meta = list(enumjson.items_path(f.name, 'docs.item.meta'))
+            self.assertEqual(meta, ['[[1, 2], {}]', '{"key": "value"}', 'null'])
+            partial = enumjson.parse_path(f.name)
+            next(partial)
+            partial.close()
+        finally:
+            os.unlink(f.name)
+
+    def test_documents(self):
+        lines = u'{"id": 1, "tags": ["\xe9"]}\n{"id": 2}\n\n  [3]\n"x" 4 null{"id": 5}\n'
+        source = lines.encode('utf-8')
+        starts = [0, 26, 39, 43, 47, 49, 53]
+        for buf_size in (1, 3, 1024):
+            documents = list(self.backend.iter_documents(BytesIO(source), as_objects=True,
+                                                         buf_size=buf_size))
+            self.assertEqual([offset for index, offset, doc in documents], starts)
+            self.assertEqual([doc for index, offset, doc in documents],
+                             [{'id': 1, 'tags': [u'\xe9']}, {'id': 2}, [3], 'x', 4, None,
+                              {'id': 5}])
+            self.assertEqual(list(self.backend.items_per_document(BytesIO(source), 'id',
+                                                                  buf_size=buf_size)),
+                             [(0, 0, '1'), (1, 26, '2'), (6, 53, '5')])
+        self.assertEqual(list(self.backend.iter_documents(StringIO(lines))),
+                         list(self.backend.iter_documents(BytesIO(source))))
+        self.assertEqual(list(self.backend.iter_documents(BytesIO(b' \n'))), [])
+        self.assertEqual(list(self.backend.basic_parse(BytesIO(b'1 2'), multiple_values=True)),
+                         [('number', '1'), ('number', '2')])
+        with self.assertRaises(enumjson.JSONError):
+            list(self.backend.iter_documents(BytesIO(b'{"id": 1}\n{"id" 2}\n')))
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -1,6 +1,11 @@
+import os
+import tempfile
 import unittest
 from io import BytesIO, StringIO
-from enumjson.backends.yajl2 import basic_parse
+import enumjson
+from enumjson.backends import python, yajl2
+from enumjson.backends.yajl2 import basic_parse, basic_parse_batches, Parser, parse_batches, \
+    items, items_batches, multi_items, iter_documents
 from enumjson.common import parse
 
 JSON = b'''
@@ -40,6 +45,133 @@ class TestYajl2Bakend(unittest.TestCase):
         for item in parse(basic_parse(BytesIO(JSON))):
             print(item)
 
+    def test_handle_allocations(self):
+        allocations = []
+        class Counting(Parser):
+            def _alloc(self):
+                allocations.append(None)
+                return Parser._alloc(self)
+        parser = Counting()
+        self.assertEqual(len(allocations), 0)
+        list(parser.basic_parse(BytesIO(JSON)))
+        self.assertEqual(len(allocations), 1)
+        list(parser.basic_parse(BytesIO(b'{"id": 1}\n[2]\n"three" 4\n'), 5,
+                                offsets=enumjson.DocumentOffsets()))
+        self.assertEqual(len(allocations), 5)
+        parser.feed(JSON)
+        parser.close()
+        parser.reset()
+        self.assertEqual(len(allocations), 6)
+
+    def test_parser_reuse(self):
+        events = list(basic_parse(BytesIO(JSON)))
+        parser = Parser()
+        for i in range(3):
+            self.assertEqual(list(parser.basic_parse(BytesIO(JSON), buf_size=16)), events)
+            parser.feed(JSON[:50])
+            parser.feed(JSON[50:])
+            parser.close()
+            self.assertEqual(parser.events(), events)
+        parser.feed(b'{"a": [1, ')
+        parser.reset()
+        parser.feed(b'[true]')
+        parser.close()
+        self.assertEqual(parser.events(),
+                         [('start_array', None), ('boolean', 'true'), ('end_array', None)])
+
+
+    def test_batches(self):
+        for codes in (False, True):
+            events = list(basic_parse(BytesIO(JSON), codes=codes))
+            parser = Parser(codes=codes)
+            for buf_size in (1, 16, 64 * 1024):
+                for batches in (basic_parse_batches(BytesIO(JSON), buf_size=buf_size, codes=codes),
+                                parser.basic_parse_batches(BytesIO(JSON), buf_size)):
+                    batches = list(batches)
+                    self.assertTrue(all(batches))
+                    self.assertEqual([event for batch in batches for event in batch], events)
+        prefixed = list(parse(basic_parse(BytesIO(JSON))))
+        self.assertEqual([event for batch in parse_batches(BytesIO(JSON), buf_size=16)
+                          for event in batch],
+                         prefixed)
+        self.assertEqual([item for found in items_batches(BytesIO(JSON), 'docs.item.meta',
+                                                          buf_size=16)
+                          for item in found],
+                         ['[[1], {}]', '{"key": "value"}', 'null'])
+
+    def test_skip(self):
+        source = b'[{"a": ["]", "\\\\", {"[": "\\"}"}], "b": 1}, [3, {"c": []}], 2]'
+        def skipping(backend, buf_size, start):
+            skipper = enumjson.Skipper()
+            events = []
+            for event in backend.basic_parse(BytesIO(source), buf_size=buf_size, skipper=skipper):
+                events.append(event)
+                if event == start:
+                    skipper.skip = True
+            return events
+        for start in (('start_map', None), ('start_array', None)):
+            expected = skipping(python, 1024, start)
+            for buf_size in (1, 3, 1024):
+                self.assertEqual(skipping(yajl2, buf_size, start), expected)
+
+    def test_items_skip(self):
+        for prefix in ('docs', 'docs.item.meta', 'docs.item.meta.item', 'docs.item.string'):
+            expected = list(python.items(BytesIO(JSON), prefix))
+            for buf_size in (5, 64 * 1024):
+                self.assertEqual(list(items(BytesIO(JSON), prefix, skip=True, buf_size=buf_size)),
+                                 expected)
+        patterns = ['docs.*.meta.key', 'docs.*.integer']
+        self.assertEqual(list(multi_items(BytesIO(JSON), patterns, skip=True)),
+                         list(python.multi_items(BytesIO(JSON), patterns)))
+
+    def test_trusted(self):
+        truncated = b'[{"a": 1}, {"a": 2}, {"a": 3'
+        with self.assertRaises(enumjson.JSONError):
+            list(items(BytesIO(truncated), 'item'))
+        self.assertEqual(list(items(BytesIO(truncated), 'item', as_objects=True, trusted=True)),
+                         [{'a': 1}, {'a': 2}])
+        events = list(basic_parse(BytesIO(JSON)))
+        self.assertEqual(list(basic_parse(BytesIO(JSON), trusted=True)), events)
+        self.assertEqual(list(basic_parse(BytesIO(JSON), dont_validate_strings=True)), events)
+
+    def test_trusted_invalid_utf8(self):
+        source = b'["\xff\xfe", {"k\xff": 1}]'
+        with self.assertRaises(enumjson.JSONError):
+            list(basic_parse(BytesIO(source)))
+        self.assertEqual(list(basic_parse(BytesIO(source), trusted=True)), [
+            ('start_array', None), ('string', u'\ufffd\ufffd'), ('start_map', None),
+            ('map_key', u'k\ufffd'), ('number', '1'), ('end_map', None), ('end_array', None),
+        ])
+
+    def test_documents(self):
+        source = b'{"id": 1}\n[2]\n"three" 4\n'
+        documents = [(0, 0, '{"id": 1}'), (1, 10, '[2]'), (2, 14, 'three'), (3, 22, '4')]
+        for buf_size in (1, 5, 1024):
+            self.assertEqual(list(iter_documents(BytesIO(source), buf_size=buf_size)), documents)
+        parser = Parser()
+        offsets = enumjson.DocumentOffsets()
+        events = list(parser.basic_parse(BytesIO(source), offsets=offsets))
+        self.assertEqual(events, [
+            ('start_map', None), ('map_key', 'id'), ('number', '1'), ('end_map', None),
+            ('start_array', None), ('number', '2'), ('end_array', None),
+            ('string', 'three'), ('number', '4'),
+        ])
+        self.assertEqual(list(offsets), [0, 10, 14, 22])
+        self.assertEqual(list(parser.basic_parse(BytesIO(JSON))), list(basic_parse(BytesIO(JSON))))
+        with self.assertRaises(enumjson.JSONError):
+            list(parser.basic_parse(BytesIO(source)))
+
+    def test_mapped_file_errors(self):
+        with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as f:
+            f.write(b'{"docs": [{"a": [2, 3}]}')
+        try:
+            with self.assertRaises(enumjson.JSONError):
+                with enumjson.MappedFile(f.name) as mapped:
+                    list(items(mapped, 'docs.item'))
+            with self.assertRaises(enumjson.JSONError):
+                list(enumjson.items_path(f.name, 'docs.item'))
+        finally:
+            os.unlink(f.name)
 
 
 if __name__ == "__main__":
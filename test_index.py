@@ -0,0 +1,43 @@
+import os
+import tempfile
+import unittest
+from io import BytesIO
+import enumjson
+import enumjson.index
+from test_backends_python import JSON
+
+
+class TestIndex(unittest.TestCase):
+
+    def test_build_index(self):
+        source = u'{"a": {"docs": [0]}, "docs": [{"x": "\xe9\\"]"}, [1, [2]], "s", 3.5], "b": 1}'
+        source = source.encode('utf-8')
+        for buf_size in (1, 5, 1024):
+            index = enumjson.index.build_index(BytesIO(source), 'docs.item', buf_size)
+            self.assertEqual([source[offset:offset + length] for offset, length in
+                              zip(index.offsets, index.lengths)],
+                             [u'{"x": "\xe9\\"]"}'.encode('utf-8'), b'[1, [2]]', b'"s"', b'3.5'])
+            self.assertEqual(index.size, len(source))
+        self.assertRaises(ValueError, enumjson.index.build_index, BytesIO(source), 'docs')
+
+    def test_get_items(self):
+        with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as f:
+            f.write(JSON)
+        try:
+            created = enumjson.index.create_index(f.name, 'docs.item.meta.item')
+            index = enumjson.index.load_index(f.name + enumjson.index.SUFFIX)
+            self.assertEqual(index.prefix, 'docs.item.meta.item')
+            self.assertEqual(list(index.offsets), list(created.offsets))
+            self.assertEqual(enumjson.index.get_item(f.name, index, 0, as_objects=True), [1, 2])
+            self.assertEqual(enumjson.index.get_items(f.name, index), ['[1, 2]', '{}'])
+            self.assertEqual(enumjson.index.get_items(f.name, index, -1), ['{}'])
+            index = enumjson.index.create_index(f.name, 'docs.item')
+            self.assertEqual(enumjson.index.get_items(f.name, index, 2, as_objects=True),
+                             [{'meta': {'key': 'value'}}, {'meta': None}])
+        finally:
+            os.unlink(f.name)
+            os.unlink(f.name + enumjson.index.SUFFIX)
+
+
+if __name__ == "__main__":
+    unittest.main()
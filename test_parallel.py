@@ -0,0 +1,69 @@
+import os
+import tempfile
+import time
+import unittest
+import enumjson
+import enumjson.parallel
+from test_backends_python import JSON
+
+
+def delayed(value):
+    time.sleep(value)
+    return value
+
+
+class TestParallel(unittest.TestCase):
+
+    def test_pool_map_completion_order(self):
+        delays = [0.8, 0.4, 0]
+        self.assertEqual(list(enumjson.parallel.pool_map(delayed, [(delay,) for delay in delays],
+                                                          workers=3, ordered=False)),
+                         sorted(delays))
+
+    def test_item_ranges(self):
+        source = b'{"a": {"docs": [9]}, "docs": [1, "],\\"", {"x": [2, 3]}, 4], "b": []}'
+        ranges = list(enumjson.parallel.item_ranges(source, 'docs.item', chunk_size=1))
+        self.assertEqual([source[start:end] for start, end in ranges],
+                         [b'1', b' "],\\""', b' {"x": [2, 3]}', b' 4'])
+        self.assertRaises(ValueError, list, enumjson.parallel.item_ranges(source, 'docs'))
+        for source in (b'{"x": 1]}', b'{"docs": [1, 2}', b'{"docs": [[1}]}', b'[1, "a": 2]',
+                       b'{"docs": [1, 2', b'{"a": {'):
+            with self.assertRaises(enumjson.JSONError):
+                list(enumjson.parallel.item_ranges(source, 'docs.item'))
+
+    def test_parallel_items(self):
+        with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as f:
+            f.write(JSON)
+        try:
+            for ordered in (True, False):
+                meta = list(enumjson.parallel.parallel_items(
+                    f.name, 'docs.item', workers=2, ordered=ordered, chunk_size=10,
+                    as_objects=True))
+                self.assertEqual(len(meta), 4)
+                self.assertIn({'meta': {'key': 'value'}}, meta)
+        finally:
+            os.unlink(f.name)
+
+    def test_line_ranges(self):
+        source = b'{"a": 1}\n\n[2]\n3'
+        ranges = list(enumjson.parallel.line_ranges(source, chunk_size=2))
+        self.assertEqual([source[start:end] for start, end in ranges],
+                         [b'{"a": 1}\n', b'\n[2]\n', b'3'])
+
+    def test_items_lines(self):
+        lines = b''.join(b'{"id": %d, "tags": ["a", "b"]}\n' % i for i in range(50))
+        with tempfile.NamedTemporaryFile(suffix='.jsonl', delete=False) as f:
+            f.write(lines)
+        try:
+            ids = list(enumjson.parallel.items_lines(f.name, 'id', workers=2, chunk_size=100,
+                                            as_objects=True))
+            self.assertEqual(ids, list(range(50)))
+            tags = list(enumjson.parallel.items_lines(f.name, 'tags.item', workers=2, ordered=False,
+                                             chunk_size=100))
+            self.assertEqual(sorted(tags), sorted(['a', 'b'] * 50))
+        finally:
+            os.unlink(f.name)
+
+
+if __name__ == "__main__":
+    unittest.main()
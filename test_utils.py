@@ -0,0 +1,63 @@
+import unittest
+from io import BytesIO
+import enumjson.backends.python
+import enumjson.utils
+from enumjson.common import parse
+from test_backends_python import JSON
+
+
+@enumjson.utils.coroutine
+def collector(found):
+    while True:
+        found.append((yield))
+
+
+class TestUtils(unittest.TestCase):
+
+    def test_dispatcher(self):
+        docs, meta, rest = [], [], []
+        target = enumjson.utils.dispatcher([
+            ('docs.item.meta', collector(meta)),
+            ('docs', collector(docs)),
+            ('docs.item.met', collector(rest)),
+            ('', collector(rest)),
+        ])
+        events = list(parse(enumjson.backends.python.basic_parse(BytesIO(JSON))))
+        for event in events:
+            target.send(event)
+        in_meta = [e for e in events if e[0].startswith('docs.item.meta')]
+        self.assertEqual(meta, in_meta)
+        self.assertEqual(docs, [e for e in events if e[0].startswith('docs') and e not in in_meta])
+        self.assertEqual(rest, [e for e in events if not e[0].startswith('docs')])
+
+        batches = []
+        target = enumjson.utils.dispatcher_batches([('docs.item.meta', collector(batches))])
+        target.send(events[:25])
+        target.send(events[25:])
+        self.assertEqual(batches, [in_meta[:2], in_meta[2:]])
+
+    def test_foreach(self):
+        items = []
+
+        def item():
+            items.append([])
+            return collector(items[-1])
+
+        events = list(parse(enumjson.backends.python.basic_parse(BytesIO(JSON))))
+        target = enumjson.utils.foreach(item)
+        for event in events[2:-1]:
+            target.send(event)
+        self.assertEqual([len(events) for events in items], [18, 11, 7, 4])
+        self.assertEqual(items[1][0], ('docs.item', 'start_map', None))
+
+        items[:] = []
+        target = enumjson.utils.foreach_batches(item)
+        target.send(events[2:10])
+        target.send(events[10:-1])
+        self.assertEqual([[len(batch) for batch in batches] for batches in items],
+                         [[7, 11], [11], [7], [4]])
+        self.assertRaises(Exception, enumjson.utils.foreach(item).send, events[0])
+
+
+if __name__ == "__main__":
+    unittest.main()